@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import Category, Product, ProductImage
+from django.http import StreamingHttpResponse
+from django.utils.timezone import now
+from . import exporter
+from .models import Category, ImageBlob, PendingUpload, Product, ProductImage, StorageDeletion
+from .signals import products_changed
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -29,16 +33,57 @@ class ProductAdmin(admin.ModelAdmin):
     ordering = ("-created_at",)
     inlines = [ProductImageInline]
 
-    actions = ["activate_products", "deactivate_products"]
+    actions = ["activate_products", "deactivate_products", "export_csv", "export_jsonl"]
 
     def activate_products(self, request, queryset):
         """Mark selected products as active"""
-        updated = queryset.update(is_active=True)
+        pks = list(queryset.values_list("pk", flat=True))
+        updated = queryset.update(is_active=True, updated_at=now())
+        products_changed.send(sender=Product, pks=pks)
         self.message_user(request, f"{updated} product(s) successfully activated.")
     activate_products.short_description = "Approve selected products"
 
     def deactivate_products(self, request, queryset):
         """Mark selected products as inactive"""
-        updated = queryset.update(is_active=False)
+        pks = list(queryset.values_list("pk", flat=True))
+        updated = queryset.update(is_active=False, updated_at=now())
+        products_changed.send(sender=Product, pks=pks)
         self.message_user(request, f"{updated} product(s) successfully deactivated.")
     deactivate_products.short_description = "Unapprove selected products"
+
+    def export_products(self, queryset, fmt):
+        """Streams the selected products as a gzipped file; memory use does not grow with the selection."""
+        response = StreamingHttpResponse(
+            exporter.export_chunks(exporter.export_queryset(queryset), fmt, compress=True),
+            content_type="application/gzip",
+        )
+        response["Content-Disposition"] = f'attachment; filename="{exporter.filename(fmt, True, now())}"'
+        return response
+
+    def export_csv(self, request, queryset):
+        return self.export_products(queryset, "csv")
+    export_csv.short_description = "Export selected products (CSV, gzip)"
+
+    def export_jsonl(self, request, queryset):
+        return self.export_products(queryset, "jsonl")
+    export_jsonl.short_description = "Export selected products (JSONL, gzip)"
+
+@admin.register(PendingUpload)
+class PendingUploadAdmin(admin.ModelAdmin):
+    list_display = ("key", "purpose", "user", "created_at", "expires_at")
+    list_filter = ("purpose",)
+    search_fields = ("key", "user__username")
+    list_select_related = ("user",)
+    readonly_fields = ("created_at",)
+
+@admin.register(StorageDeletion)
+class StorageDeletionAdmin(admin.ModelAdmin):
+    list_display = ("name", "attempts", "available_at", "created_at")
+    search_fields = ("name",)
+    readonly_fields = ("name", "attempts", "last_error", "created_at")
+
+@admin.register(ImageBlob)
+class ImageBlobAdmin(admin.ModelAdmin):
+    list_display = ("sha256", "name", "size", "ref_count", "created_at")
+    search_fields = ("sha256", "name")
+    readonly_fields = ("sha256", "name", "size", "ref_count", "created_at")
@@ -0,0 +1,99 @@
+import hashlib
+import logging
+import os
+
+from django.db import close_old_connections, transaction
+from django.utils.crypto import get_random_string
+from django.utils.timezone import now
+
+from utils import renditions
+from utils.renditions import rendition_names
+
+from .models import ImageBlob, Product, ProductImage, StorageDeletion
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+def digest(file):
+    """``(sha256 hex digest, size)`` of ``file``, read in chunks; the file is rewound."""
+    sha256 = hashlib.sha256()
+    size = 0
+    file.seek(0)
+    for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+        sha256.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    return sha256.hexdigest(), size
+
+
+def blob_name(sha256, filename):
+    """
+    ``products/blobs/ab/ab12...ef_x7k2q9mz.jpg``: a fresh name for every new
+    blob, so an object still queued for deletion by an earlier blob with the
+    same content is never the one a new blob is stored at.
+    """
+    ext = os.path.splitext(filename)[1][:10].lower()
+    suffix = get_random_string(8, "abcdefghijklmnopqrstuvwxyz0123456789")
+    return f"products/blobs/{sha256[:2]}/{sha256}_{suffix}{ext}"
+
+
+def shared_renditions(names):
+    """``{image name: renditions}`` already generated for other ProductImages of ``names``."""
+    found = {}
+    for name, data in ProductImage.objects.filter(image__in=set(names)).values_list("image", "renditions"):
+        if data and data.get("source") == name:
+            found.setdefault(name, data)
+    return found
+
+
+def adopt(names):
+    """
+    Hashes ProductImages of ``names`` that have no blob yet, reading them back
+    from S3 (direct uploads never pass through a worker). An image whose
+    content is already stored is pointed at that blob and its own copy is
+    queued for deletion; new content becomes a blob where it is. Renditions
+    are then generated for whatever has none.
+    """
+    pending = []
+    for image in ProductImage.objects.filter(image__in=names, blob__isnull=True):
+        name = image.image.name
+        try:
+            with image.image.storage.open(name, "rb") as source:
+                sha256, size = digest(source)
+        except Exception:
+            logger.exception("Could not hash %s", name)
+            pending.append(name)
+            continue
+        with transaction.atomic():
+            blob, created = ImageBlob.reference(sha256, size, name)
+            if created:
+                ProductImage.objects.filter(pk=image.pk).update(blob=blob)
+                pending.append(name)
+                continue
+            data = shared_renditions([blob.name]).get(blob.name, {})
+            ProductImage.objects.filter(pk=image.pk).update(
+                blob=blob, image=blob.name, renditions=data, updated_at=now()
+            )
+            StorageDeletion.enqueue(name, *rendition_names(image))
+            Product.objects.filter(pk=image.product_id).refresh_primary_images()
+            if not data:
+                pending.append(blob.name)
+    renditions.process(ProductImage, pending)
+
+
+def _adopt(names):
+    try:
+        adopt(names)
+    except Exception:
+        logger.exception("Deduplicating %d product images failed", len(names))
+    finally:
+        close_old_connections()
+
+
+def schedule_adoption(names):
+    """Queue ``adopt`` on the rendition pool for after the current transaction commits."""
+    names = [name for name in names if name]
+    if names:
+        transaction.on_commit(lambda: renditions.pool().submit(_adopt, names))
@@ -0,0 +1,66 @@
+import hashlib
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.utils.timezone import now
+
+from . import categories
+
+CARD_TEMPLATE = "default/catalog/product_card.html"
+ROW_TEMPLATE = "default/customer/dashboard/product_row.html"
+
+
+def card_cache():
+    return caches[getattr(settings, "PRODUCT_CARD_CACHE", "default")]
+
+
+def card_key(product, prefix):
+    """
+    A card's key changes whenever what it shows can change: the product row
+    (``updated_at``, which is also touched when its primary image changes);
+    ``prefix`` carries the template and the category version. Stale
+    fragments are simply never read again and age out of the cache.
+    """
+    return f"{prefix}:{product.pk}:{product.updated_at.timestamp():.6f}"
+
+
+def card_timeout(product):
+    """``timesince`` on a card ticks by the minute, hour or day depending on the product's age."""
+    age = now() - product.created_at
+    if age < timedelta(days=1):
+        timeout = 60
+    elif age < timedelta(days=7):
+        timeout = 60 * 60
+    else:
+        timeout = 24 * 60 * 60
+    return min(timeout, getattr(settings, "PRODUCT_CARD_CACHE_TIMEOUT", 24 * 60 * 60))
+
+
+def render_cards(products, template_name=CARD_TEMPLATE):
+    """
+    Rendered ``template_name`` for each product, as ``[(product, html)]``.
+    The whole page is read with one ``get_many``; only the misses are
+    rendered and written back.
+    """
+    cache = card_cache()
+    prefix = "catalog:card:{}:{}".format(
+        hashlib.md5(template_name.encode()).hexdigest()[:8], categories.current_version()
+    )
+    keys = [card_key(product, prefix) for product in products]
+    found = cache.get_many(keys)
+
+    missing = defaultdict(dict)
+    cards = []
+    for product, key in zip(products, keys):
+        html = found.get(key)
+        if html is None:
+            html = render_to_string(template_name, {"product": product})
+            missing[card_timeout(product)][key] = html
+        cards.append((product, mark_safe(html)))
+    for timeout, fragments in missing.items():
+        cache.set_many(fragments, timeout)
+    return cards
@@ -0,0 +1,54 @@
+import threading
+import time
+
+from django.conf import settings
+
+from utils.cache import get_or_compute, shared_cache
+
+from .models import Category
+
+VERSION_KEY = "catalog:categories:version"
+
+_lock = threading.Lock()
+_local = {"version": None, "loaded_at": 0, "categories": ()}
+
+
+def bump_version():
+    """Invalidate every worker's category list (called from the Category signals)."""
+    try:
+        shared_cache().incr(VERSION_KEY)
+    except ValueError:
+        shared_cache().set(VERSION_KEY, 2, None)
+
+
+def current_version():
+    return shared_cache().get_or_set(VERSION_KEY, 1, None)
+
+
+def all_categories():
+    """
+    Every category ordered by id. Each worker keeps the list in memory and
+    only checks the version counter in the shared cache; on a new version the
+    list is taken from the shared cache, and only the first worker to see it
+    queries the database. Both copies also expire after
+    ``CATEGORIES_CACHE_TIMEOUT`` seconds, so a version counter that the cache
+    lost and restarted cannot keep an old list alive.
+    """
+    version = current_version()
+    timeout = getattr(settings, "CATEGORIES_CACHE_TIMEOUT", 10 * 60)
+    with _lock:
+        if _local["version"] == version and time.monotonic() - _local["loaded_at"] < timeout:
+            return list(_local["categories"])
+
+    categories = get_or_compute(
+        f"catalog:categories:{version}", lambda: tuple(Category.objects.order_by("id")), timeout, name="categories"
+    )
+    with _lock:
+        _local["version"] = version
+        _local["loaded_at"] = time.monotonic()
+        _local["categories"] = categories
+    return list(categories)
+
+
+def home_categories():
+    return [category for category in all_categories() if category.is_active and category.include_in_home]
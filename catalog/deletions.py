@@ -0,0 +1,88 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import now
+from storages.backends.s3boto3 import S3Boto3Storage
+
+from .models import StorageDeletion
+
+logger = logging.getLogger(__name__)
+
+# How long a worker owns the rows it picked before another may retry them.
+LEASE = 5 * 60
+
+
+def backoff(attempts):
+    """Seconds to wait before retry number ``attempts``: 1, 2, 4 ... minutes, capped at a day."""
+    return min(60 * 2 ** (attempts - 1), 24 * 60 * 60)
+
+
+def _lease(batch_size):
+    """Claims up to ``batch_size`` due rows by pushing their ``available_at`` past the lease."""
+    with transaction.atomic():
+        rows = list(
+            StorageDeletion.objects.select_for_update(skip_locked=True)
+            .filter(available_at__lte=now(), attempts__lt=getattr(settings, "STORAGE_DELETION_MAX_ATTEMPTS", 10))
+            .order_by("pk")[:batch_size]
+        )
+        StorageDeletion.objects.filter(pk__in=[row.pk for row in rows]).update(
+            available_at=now() + timedelta(seconds=LEASE)
+        )
+    return rows
+
+
+def _failed(rows, error=None):
+    for row in rows:
+        row.attempts += 1
+        if error is not None:
+            row.last_error = error
+        row.last_error = row.last_error[:1000]
+        row.available_at = now() + timedelta(seconds=backoff(row.attempts))
+    StorageDeletion.objects.bulk_update(rows, ["attempts", "last_error", "available_at"])
+
+
+def drain(batch_size=1000, storage=None):
+    """
+    Deletes the queued objects with one ``delete_objects`` call per batch of
+    up to 1000 keys (the S3 limit) until nothing is due. Keys S3 reports as
+    failed, and whole batches whose request failed, are retried later with an
+    exponential backoff; rows that used up ``STORAGE_DELETION_MAX_ATTEMPTS``
+    stay in the table for inspection. Returns ``(deleted, failed)`` counts.
+    """
+    storage = storage or S3Boto3Storage()
+    client = storage.connection.meta.client
+    batch_size = min(batch_size, 1000)
+    deleted = failed = 0
+    while True:
+        rows = _lease(batch_size)
+        if not rows:
+            return deleted, failed
+
+        by_key = {}
+        for row in rows:
+            by_key.setdefault(storage._normalize_name(row.name), []).append(row)
+        try:
+            response = client.delete_objects(
+                Bucket=storage.bucket_name,
+                Delete={"Objects": [{"Key": key} for key in by_key], "Quiet": True},
+            )
+        except Exception as e:
+            logger.exception("Deleting %d objects from S3 failed", len(by_key))
+            _failed(rows, str(e))
+            failed += len(rows)
+            continue
+
+        retry = []
+        for error in response.get("Errors", []):
+            logger.error("Could not delete %s: %s", error["Key"], error.get("Message"))
+            for row in by_key.pop(error["Key"], []):
+                row.last_error = f"{error.get('Code')}: {error.get('Message')}"
+                retry.append(row)
+        if retry:
+            _failed(retry)
+            failed += len(retry)
+        done = [row.pk for rows_for_key in by_key.values() for row in rows_for_key]
+        StorageDeletion.objects.filter(pk__in=done).delete()
+        deleted += len(done)
@@ -0,0 +1,144 @@
+import os
+from datetime import timedelta
+
+from botocore.exceptions import ClientError
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.utils.crypto import get_random_string
+from django.utils.text import get_valid_filename
+from django.utils.timezone import now
+from storages.utils import clean_name
+
+from .blobs import schedule_adoption
+from .models import PendingUpload, Product, ProductImage, StorageDeletion
+
+# purpose -> (model, file field, key prefix)
+TARGETS = {
+    PendingUpload.PRODUCT_IMAGE: ("catalog.ProductImage", "image", "products/uploads"),
+    PendingUpload.PROFILE_PICTURE: ("customer.UserProfile", "profile_picture", "profile_pictures"),
+}
+
+# Raster formats Pillow can render; SVG and other markup types are refused since
+# S3 would serve them back as active content.
+IMAGE_TYPES = ("image/jpeg", "image/png", "image/gif", "image/webp")
+
+
+class UploadError(Exception):
+    """An upload that cannot be presigned; the message is safe to show to the user."""
+
+
+def storage_for(purpose):
+    label, field_name, _ = TARGETS[purpose]
+    return apps.get_model(label)._meta.get_field(field_name).storage
+
+
+def upload_name(user, purpose, filename):
+    """A fresh, unguessable object name under the purpose's prefix."""
+    try:
+        filename = get_valid_filename(os.path.basename(filename))
+    except SuspiciousFileOperation:
+        filename = "image"
+    root, ext = os.path.splitext(filename)
+    return clean_name(f"{TARGETS[purpose][2]}/{user.pk}/{root[:50]}_{get_random_string(12)}{ext[:10].lower()}")
+
+
+def presign(user, purpose, filename, content_type, size=None):
+    """
+    Records a ``PendingUpload`` for ``user`` and returns it with the presigned
+    POST (``{"url": ..., "fields": {...}}``) the browser sends the file with.
+    S3 itself enforces the content type and the size limit, so the bytes
+    never pass through a worker.
+    """
+    if purpose not in TARGETS:
+        raise UploadError("Unknown upload type.")
+    if content_type not in IMAGE_TYPES:
+        raise UploadError("Only JPEG, PNG, GIF and WebP images can be uploaded.")
+    max_size = getattr(settings, "DIRECT_UPLOAD_MAX_SIZE", 10 * 1024 * 1024)
+    if size is not None and not 0 < size <= max_size:
+        raise UploadError(f"Images must be smaller than {max_size // (1024 * 1024)} MB.")
+    max_pending = getattr(settings, "DIRECT_UPLOAD_MAX_PENDING", 20)
+    if PendingUpload.objects.filter(user=user, expires_at__gt=now()).count() >= max_pending:
+        raise UploadError("Too many uploads in progress. Please try again later.")
+
+    name = upload_name(user, purpose, filename)
+    storage = storage_for(purpose)
+    post = storage.connection.meta.client.generate_presigned_post(
+        storage.bucket_name,
+        storage._normalize_name(name),
+        Fields={"Content-Type": content_type},
+        Conditions=[{"Content-Type": content_type}, ["content-length-range", 1, max_size]],
+        ExpiresIn=getattr(settings, "DIRECT_UPLOAD_EXPIRES", 600),
+    )
+    upload = PendingUpload.objects.create(
+        user=user,
+        purpose=purpose,
+        key=name,
+        original_name=filename[:255],
+        content_type=content_type,
+        expires_at=now() + timedelta(seconds=getattr(settings, "DIRECT_UPLOAD_TTL", 60 * 60)),
+    )
+    return upload, post
+
+
+def claim(user, purpose, ids):
+    """
+    The unexpired uploads of ``user`` among ``ids`` whose object really is in
+    the bucket, checked with one HEAD each. Returns ``(uploads, failed)``
+    where ``failed`` names the files that cannot be attached.
+    """
+    try:
+        ids = {int(pk) for pk in ids}
+    except (TypeError, ValueError):
+        return [], ["unknown upload"]
+    uploads = list(PendingUpload.objects.filter(pk__in=ids, user=user, purpose=purpose, expires_at__gt=now()))
+    failed = ["expired upload"] * (len(ids) - len(uploads))
+
+    storage = storage_for(purpose)
+    client = storage.connection.meta.client
+    claimed = []
+    for upload in uploads:
+        try:
+            head = client.head_object(Bucket=storage.bucket_name, Key=storage._normalize_name(upload.key))
+        except ClientError:
+            failed.append(upload.original_name)
+            continue
+        if head.get("ContentType") not in IMAGE_TYPES:
+            failed.append(upload.original_name)
+            continue
+        claimed.append(upload)
+    return claimed, failed
+
+
+def attach_product_images(product, uploads):
+    """Creates the ProductImage rows for claimed ``uploads`` in one insert."""
+    if not uploads:
+        return []
+    with transaction.atomic():
+        images = ProductImage.objects.bulk_create(
+            [ProductImage(product=product, image=upload.key) for upload in uploads]
+        )
+        PendingUpload.objects.filter(pk__in=[upload.pk for upload in uploads]).delete()
+        Product.objects.filter(pk=product.pk).refresh_primary_images()
+        # Hashed in the background (deduplicated against existing blobs), then rendered
+        schedule_adoption([image.image.name for image in images])
+    return images
+
+
+def purge_expired(batch_size=1000):
+    """
+    Queues the objects of uploads that were never attached for deletion and
+    removes their rows. Returns the number of uploads removed.
+    """
+    removed = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                PendingUpload.objects.filter(expires_at__lte=now()).order_by("pk").values_list("pk", "key")[:batch_size]
+            )
+            if not batch:
+                return removed
+            StorageDeletion.enqueue(*[key for _, key in batch])
+            PendingUpload.objects.filter(pk__in=[pk for pk, _ in batch]).delete()
+        removed += len(batch)
@@ -0,0 +1,125 @@
+import csv
+import json
+import zlib
+
+from .models import Product, ProductImage
+
+# Column name -> Product.values_list() lookup; "primary_image_url" is derived.
+# The columns match what ``import_products`` reads, so an export can be imported again.
+COLUMNS = {
+    "id": "pk",
+    "name": "name",
+    "slug": "slug",
+    "brand": "brand",
+    "category": "category__slug",
+    "category_name": "category__name",
+    "seller": "created_by__username",
+    "is_active": "is_active",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+    "primary_image_url": "primary_image",
+    "specification": "specification",
+    "description": "description",
+}
+
+CONTENT_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+# Bytes collected before a chunk is handed on; keeps the number of tiny
+# writes (and gzip flushes) down without holding much in memory.
+CHUNK_BYTES = 64 * 1024
+
+
+def export_queryset(queryset=None, since=None):
+    """Products to export in primary-key order, changed at or after ``since`` if given."""
+    queryset = Product.objects.all() if queryset is None else queryset
+    if since is not None:
+        queryset = queryset.filter(updated_at__gte=since)
+    return queryset.order_by("pk").values_list(*COLUMNS.values())
+
+
+def batches(queryset, chunk_size=2000):
+    """
+    ``queryset`` (from ``export_queryset``) in primary-key batches of
+    ``chunk_size``, each its own ``WHERE id > last`` query. PyMySQL buffers
+    a whole result set client-side, so ``.iterator()`` would hold every row
+    in memory at once.
+    """
+    last = None
+    while True:
+        page = queryset if last is None else queryset.filter(pk__gt=last)
+        batch = list(page[:chunk_size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1][0]  # "id" is the first column
+
+
+def rows(queryset, chunk_size=2000):
+    """
+    One dict per product, read in keyset batches so memory stays flat however
+    many products there are. The primary image comes from the denormalized
+    column and its URL is built without a query.
+    """
+    storage = ProductImage._meta.get_field("image").storage
+    for batch in batches(queryset, chunk_size):
+        for values in batch:
+            row = dict(zip(COLUMNS, values))
+            row["primary_image_url"] = storage.url(row["primary_image_url"]) if row["primary_image_url"] else ""
+            row["is_active"] = int(row["is_active"])
+            row["created_at"] = row["created_at"].isoformat() if row["created_at"] else ""
+            row["updated_at"] = row["updated_at"].isoformat() if row["updated_at"] else ""
+            yield row
+
+
+class _Line:
+    """File-like target for csv.writer that just hands back what it was given."""
+
+    def write(self, value):
+        return value
+
+
+def _collect(pieces):
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_BYTES:
+            yield "".join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+def csv_chunks(rows):
+    writer = csv.writer(_Line())
+
+    def lines():
+        yield writer.writerow(COLUMNS)
+        for row in rows:
+            yield writer.writerow(row.values())
+
+    yield from _collect(lines())
+
+
+def jsonl_chunks(rows):
+    yield from _collect(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+
+
+def gzip_chunks(chunks):
+    """Compresses a stream of byte chunks into one gzip stream, on the fly."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(queryset, fmt="csv", compress=False, chunk_size=2000):
+    """Byte chunks of ``queryset`` (from ``export_queryset``) as CSV or JSONL, optionally gzipped."""
+    chunks = (csv_chunks if fmt == "csv" else jsonl_chunks)(rows(queryset, chunk_size))
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def filename(fmt, compress, stamp):
+    return f"products-{stamp:%Y%m%d-%H%M%S}.{fmt}{'.gz' if compress else ''}"
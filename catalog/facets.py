@@ -0,0 +1,102 @@
+import hashlib
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from utils.cache import get_or_compute, shared_cache
+
+from .models import Product
+from .search import tokenize
+
+VERSION_KEY = "catalog:facets:version"
+
+
+def bump_version():
+    """
+    Invalidate every cached facet count (called from product/category
+    signals). The version lives in the shared cache so a change saved by one
+    worker retires the counts every other worker has cached.
+    """
+    try:
+        shared_cache().incr(VERSION_KEY)
+    except ValueError:
+        shared_cache().set(VERSION_KEY, 2, None)
+
+
+def current_version():
+    return shared_cache().get_or_set(VERSION_KEY, 1, None)
+
+
+def _cache_key(suffix):
+    return f"catalog:facets:{current_version()}:{suffix}"
+
+
+def catalog_pairs():
+    """
+    Active product counts per ``(category id, brand)`` for the whole catalog.
+    One grouped aggregate serves both facets for every category/brand
+    selection, and the result is cached until the next catalog change.
+    """
+
+    def count():
+        rows = (
+            Product.objects.filter(is_active=True)
+            .values_list("category_id", "brand")
+            .annotate(count=Count("pk"))
+            .order_by()
+        )
+        return Counter({(category_id, brand): count for category_id, brand, count in rows})
+
+    return get_or_compute(_cache_key("all"), count, settings.FACETS_CACHE_TIMEOUT, stale=60, name="facets")
+
+
+def search_pairs(query, scores, index):
+    """
+    The same counts for the hits of a search query, taken from the search
+    index. ``scores`` is a callable that is only run on a cache miss.
+    """
+    normalized = " ".join(tokenize(query))
+    key = _cache_key("q:" + hashlib.md5(normalized.encode()).hexdigest())
+    pairs = cache.get(key)
+    if pairs is None:
+        pairs = index.facet_pairs(scores())
+        cache.set(key, pairs, settings.FACETS_CACHE_TIMEOUT)
+    return pairs
+
+
+def build_facets(pairs, categories, category_id=None, brand=None, brand_limit=20):
+    """
+    Category counts honour the brand filter and brand counts honour the
+    category filter, so each facet shows what selecting an entry would yield.
+    Brands are grouped case-insensitively and labelled with their most common
+    spelling.
+    """
+    selected_brand = brand.strip().casefold() if brand else None
+    category_counts = Counter()
+    brand_counts = Counter()
+    spellings = {}
+    for (pair_category, pair_brand), count in pairs.items():
+        brand_key = pair_brand.strip().casefold()
+        if selected_brand is None or brand_key == selected_brand:
+            category_counts[pair_category] += count
+        if category_id is None or pair_category == category_id:
+            brand_counts[brand_key] += count
+            spellings.setdefault(brand_key, Counter())[pair_brand.strip()] += count
+
+    return {
+        "categories": [
+            {"category": category, "count": category_counts.get(category.pk, 0)}
+            for category in categories
+        ],
+        "brands": [
+            {
+                "value": spellings[brand_key].most_common(1)[0][0],
+                "count": count,
+                "selected": brand_key == selected_brand,
+            }
+            for brand_key, count in brand_counts.most_common(brand_limit)
+            if brand_key
+        ],
+    }
@@ -9,9 +9,36 @@
 # */
 
 from django import forms
-from .models import Product, Category
+from django.forms.models import ModelChoiceIterator
+from .categories import all_categories
+from .models import Product
 from tinymce.widgets import TinyMCE
 
+
+class CategoryChoiceIterator(ModelChoiceIterator):
+    """Renders category options from the cached list; submitted values are still validated against the queryset."""
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for category in all_categories():
+            yield self.choice(category)
+
+    def __len__(self):
+        return len(all_categories()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(all_categories())
+
+
+class CategoryChoiceField(forms.ModelChoiceField):
+    iterator = CategoryChoiceIterator
+
+
+class CategoryMultipleChoiceField(forms.ModelMultipleChoiceField):
+    iterator = CategoryChoiceIterator
+
+
 class ProductForm(forms.ModelForm):
     specification = forms.CharField(
         widget=TinyMCE(attrs={
@@ -32,12 +59,9 @@ class ProductForm(forms.ModelForm):
     class Meta:
         model = Product
         fields = ['name', 'category', 'brand', 'specification', 'description']
+        field_classes = {'category': CategoryChoiceField}
         widgets = {
             'name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Product Name'}),
             'category': forms.Select(attrs={'class': 'form-select'}),
             'brand': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Product Brand'}),
         }
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.fields['category'].queryset = Category.objects.all()
@@ -0,0 +1,277 @@
+import codecs
+import csv
+import gzip
+import json
+import os
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.utils.dateparse import parse_datetime
+from django.utils.text import slugify
+from django.utils.timezone import is_naive, make_aware, now
+
+from .models import Category, Product, html_to_text
+
+# Columns written on update; created_at/updated_at are written separately.
+FIELDS = [
+    "name", "slug", "brand", "specification", "description", "search_document",
+    "is_active", "category_id", "created_by_id", "updated_by_id",
+]
+
+_maps = {}
+
+
+class RowError(ValueError):
+    """A row that cannot be imported; the message says why."""
+
+
+def load_maps():
+    """
+    ``{"categories": {id or slug: id}, "users": {id or username: id}}``, loaded
+    once per process so rows resolve their foreign keys without queries.
+    """
+    if not _maps:
+        categories = {}
+        for pk, slug in Category.objects.values_list("pk", "slug"):
+            categories[str(pk)] = categories[slug] = pk
+        users = {}
+        for pk, username in User.objects.values_list("pk", "username").iterator(chunk_size=10000):
+            users[str(pk)] = users[username] = pk
+        _maps.update(categories=categories, users=users)
+    return _maps
+
+
+def open_source(path):
+    """Binary file object for ``path``, transparently un-gzipping ``.gz`` files."""
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def read_rows(source, fmt, offset=0, fieldnames=None, delimiter=","):
+    """
+    Yields ``(row, offset_after_row)`` from ``source`` (a binary file), starting
+    at byte ``offset``. Offsets let an interrupted import seek straight back to
+    where it stopped instead of re-reading the file. CSV sources need the
+    header's ``fieldnames`` when resuming past the first line.
+    """
+    position = [offset]
+    source.seek(offset)
+
+    def lines():
+        for line in source:
+            position[0] += len(line)
+            if position[0] == len(line):
+                line = line.removeprefix(codecs.BOM_UTF8)
+            yield line.decode("utf-8")
+
+    if fmt == "jsonl":
+        for line in lines():
+            if line.strip():
+                yield json.loads(line), position[0]
+        return
+
+    reader = csv.reader(lines(), delimiter=delimiter)
+    if fieldnames is None:
+        fieldnames = next(reader)
+        yield fieldnames, position[0]
+    for values in reader:
+        if values:
+            yield dict(zip(fieldnames, values)), position[0]
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "y", "t")
+
+
+def _datetime(value):
+    if not value:
+        return None
+    value = parse_datetime(str(value))
+    if value is not None and is_naive(value):
+        value = make_aware(value)
+    return value
+
+
+def _lookup(mapping, row, *columns, required=True):
+    for column in columns:
+        value = row.get(column)
+        if value not in (None, "", "0", 0):
+            try:
+                return mapping[str(value)]
+            except KeyError:
+                raise RowError(f"unknown {column} {value!r}")
+    if required:
+        raise RowError(f"missing {columns[0]}")
+    return None
+
+
+def build_product(row, maps):
+    """An unsaved Product from one CSV/JSONL row, with foreign keys resolved from ``maps``."""
+    name = (row.get("name") or "").strip()
+    if not name:
+        raise RowError("missing name")
+    product = Product(
+        id=int(row["id"]) if row.get("id") else None,
+        name=name,
+        slug=(row.get("slug") or "").strip() or slugify(name)[:250],
+        brand=row.get("brand") or "",
+        specification=row.get("specification") or "",
+        description=row.get("description") or "",
+        is_active=_bool(row.get("is_active", True)),
+        category_id=_lookup(maps["categories"], row, "category_id", "category"),
+        created_by_id=_lookup(maps["users"], row, "created_by", "seller"),
+        updated_by_id=_lookup(maps["users"], row, "updated_by", required=False),
+        created_at=_datetime(row.get("created_at")),
+        updated_at=_datetime(row.get("updated_at")),
+    )
+    product.search_document = html_to_text(product.specification, product.description)
+    return product
+
+
+def import_batch(rows, retries=3):
+    """
+    Imports one batch of rows in one transaction: existing products (matched
+    on id, or for rows without one on slug and seller) are written with
+    ``bulk_update``, the rest with ``bulk_create``. Returns ``(created,
+    updated, errors)`` where ``errors`` lists ``(row id or name, message)``.
+
+    Batches imported in parallel can both claim a slug the other has not
+    committed yet; the loser's transaction fails on the unique index and the
+    batch is resolved again against the committed slugs, up to ``retries``
+    more times.
+    """
+    maps = load_maps()
+    for attempt in range(retries + 1):
+        products, errors = [], []
+        for row in rows:
+            try:
+                products.append(build_product(row, maps))
+            except ValueError as e:
+                errors.append((row.get("id") or row.get("name"), str(e)))
+        try:
+            with transaction.atomic():
+                created, updated = _write(products)
+        except IntegrityError:
+            if attempt == retries:
+                raise
+        else:
+            return created, updated, errors
+
+
+def slug_owners(slugs):
+    """``{slug: (product id, created_by id)}`` for the products holding ``slugs``."""
+    return {
+        slug: (pk, created_by_id)
+        for slug, pk, created_by_id in Product.objects.filter(slug__in=slugs).values_list("slug", "pk", "created_by_id")
+    }
+
+
+def _write(products):
+    existing_ids = set(
+        Product.objects.filter(pk__in=[p.pk for p in products if p.pk]).values_list("pk", flat=True)
+    )
+    owners = slug_owners({p.slug for p in products})
+    seen = set()
+    new, changed = [], []
+    for product in products:
+        owner, seller = owners.get(product.slug, (None, None))
+        if product.pk is None and owner is not None and seller == product.created_by_id:
+            product.pk = owner  # the same seller's product under this slug
+            existing_ids.add(owner)
+        elif owner not in (None, product.pk) or product.slug in seen:
+            # the slug belongs to another product: append the id, or a counter
+            base, count = product.slug, 1
+            product.slug = f"{base}-{product.pk or count}"
+            while product.slug in owners or product.slug in seen or Product.objects.filter(slug=product.slug).exists():
+                count += 1
+                product.slug = f"{base}-{count}"
+        seen.add(product.slug)
+        (changed if product.pk in existing_ids else new).append(product)
+
+    # bulk_create stamps auto_now(_add) fields with the current time, so
+    # the source's timestamps are kept aside and written back afterwards
+    stamped = now()
+    dates = [(product, product.created_at, product.updated_at or stamped) for product in new + changed]
+    Product.objects.bulk_create(new)
+    Product.objects.bulk_update(changed, FIELDS)
+    for product, created_at, updated_at in dates:
+        product.created_at = created_at or product.created_at
+        product.updated_at = updated_at
+    Product.objects.bulk_update([p for p, _, _ in dates if p.pk], ["updated_at"])
+    Product.objects.bulk_update([p for p, created_at, _ in dates if p.pk and created_at], ["created_at"])
+    return len(new), len(changed)
+
+
+def init_worker():
+    """ProcessPoolExecutor initializer: each process needs Django and its own connections."""
+    import django
+
+    django.setup()
+
+
+def in_stage(row, stage):
+    """
+    Rows with an id are imported in the ``"ids"`` stage and rows without one
+    in a second ``"new"`` pass over the source. By then every id the file
+    names exists, so the ids the database assigns to new products are past
+    all of them and a later row can never update a product created from a
+    different row.
+    """
+    return bool(row.get("id")) == (stage == "ids")
+
+
+class Checkpoint:
+    """
+    Progress of one import, kept in a small JSON file next to the source. It
+    records the stage and the byte offset after the last batch known to be
+    committed (every earlier batch committed too), so a rerun continues from
+    there; batches after it may be imported twice, which is harmless since
+    rows are upserts.
+    """
+
+    STAGES = ("ids", "new")
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = os.path.abspath(source)
+        self.stage = "ids"
+        self.start = 0  # byte offset of the first row after any CSV header
+        self.offset = 0
+        self.fieldnames = None
+        self.rows = 0
+        self.has_new = False  # rows without an id were seen, so the "new" stage has work
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get("source") == self.source:
+                self.stage = data.get("stage", "ids")
+                self.start = data.get("start", 0)
+                self.offset = data["offset"]
+                self.fieldnames = data.get("fieldnames")
+                self.rows = data.get("rows", 0)
+                self.has_new = data.get("has_new", False)
+        return self
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(
+                {
+                    "source": self.source,
+                    "stage": self.stage,
+                    "start": self.start,
+                    "offset": self.offset,
+                    "fieldnames": self.fieldnames,
+                    "rows": self.rows,
+                    "has_new": self.has_new,
+                },
+                f,
+            )
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog.models import Product, html_to_text
+from catalog.search import bump_generation
+
+
+class Command(BaseCommand):
+    help = (
+        "Populate Product.search_document from the specification/description HTML. "
+        "Runs in primary-key order and commits per batch, so an interrupted run "
+        "can simply be started again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--all", action="store_true",
+            help="Recompute every product, not only those with an empty search document.",
+        )
+        parser.add_argument(
+            "--start-after", type=int, default=0,
+            help="Resume from the primary key printed by an interrupted run.",
+        )
+
+    def handle(self, *args, **options):
+        queryset = Product.objects.order_by("pk").only("pk", "specification", "description")
+        if not options["all"]:
+            queryset = queryset.filter(search_document="")
+
+        last_pk = options["start_after"]
+        total = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:options["batch_size"]])
+            if not batch:
+                break
+            for product in batch:
+                product.search_document = html_to_text(product.specification, product.description)
+            with transaction.atomic():
+                Product.objects.bulk_update(batch, ["search_document"])
+            last_pk = batch[-1].pk
+            total += len(batch)
+            self.stdout.write(f"Backfilled {total} products (last id {last_pk})")
+
+        if total:
+            bump_generation()
+        self.stdout.write(self.style.SUCCESS(f"Done: {total} products updated."))
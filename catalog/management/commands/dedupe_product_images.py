@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from catalog.blobs import adopt
+from catalog.models import ProductImage
+
+
+class Command(BaseCommand):
+    help = "Hash product images stored before deduplication and fold identical copies into shared blobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        names = list(
+            ProductImage.objects.filter(blob__isnull=True).exclude(image="").exclude(image=None).values_list("image", flat=True)
+        )
+        for start in range(0, len(names), options["batch_size"]):
+            adopt(names[start:start + options["batch_size"]])
+        remaining = ProductImage.objects.filter(blob__isnull=True).exclude(image="").exclude(image=None).count()
+        self.stdout.write(f"Processed {len(names)} image(s); {remaining} could not be hashed.")
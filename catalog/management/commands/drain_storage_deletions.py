@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.deletions import drain
+
+
+class Command(BaseCommand):
+    help = "Delete the S3 objects queued in the storage deletion outbox, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Keys per delete_objects call (max 1000).")
+        parser.add_argument("--loop", action="store_true", help="Keep running, polling every --interval seconds.")
+        parser.add_argument("--interval", type=int, default=30)
+
+    def handle(self, *args, **options):
+        while True:
+            deleted, failed = drain(batch_size=options["batch_size"])
+            if deleted or failed or not options["loop"]:
+                self.stdout.write(f"Deleted {deleted} object(s), {failed} failed and will be retried.")
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from catalog.models import Category, ProductImage
+from home.models import PromotionBanner
+from utils.renditions import needs_renditions, process
+
+
+class Command(BaseCommand):
+    help = "Generate thumbnails and WebP variants for product, category and banner images that lack them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--all", action="store_true", help="Regenerate existing renditions too.")
+
+    def handle(self, *args, **options):
+        for model in (ProductImage, Category, PromotionBanner):
+            names = [
+                instance.image.name
+                for instance in model._default_manager.exclude(image="").exclude(image=None).only("pk", "image", "renditions")
+                if options["all"] or needs_renditions(instance)
+            ]
+            done = 0
+            for start in range(0, len(names), options["batch_size"]):
+                done += len(process(model, names[start:start + options["batch_size"]]))
+            self.stdout.write(f"{model._meta.verbose_name_plural}: {done} of {len(names)} images processed")
@@ -0,0 +1,127 @@
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from catalog import facets
+from catalog.importer import Checkpoint, import_batch, in_stage, init_worker, open_source, read_rows
+from catalog.search import bump_generation
+
+
+class Command(BaseCommand):
+    help = (
+        "Import products from a CSV or JSONL file (optionally gzipped), streaming "
+        "it in batches. Columns: id, name, slug, brand, specification, description, "
+        "is_active, category_id or category (slug), created_by or seller (username), "
+        "updated_by, created_at, updated_at. Existing products (matched on id, or on "
+        "slug and seller) are updated. Rows with an id are imported first and rows without one in a second pass. Progress "
+        "is checkpointed after every batch, so rerunning an interrupted import resumes it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("source")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Defaults to the file extension.")
+        parser.add_argument("--delimiter", default=",", help="CSV delimiter (the old database dumps use ';').")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers", type=int, default=0,
+            help="Import batches in this many processes (for MySQL; SQLite serialises writers anyway).",
+        )
+        parser.add_argument("--checkpoint", help="Progress file; defaults to <source>.checkpoint.")
+        parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start from the top.")
+
+    def handle(self, *args, **options):
+        source = options["source"]
+        fmt = options["format"] or ("jsonl" if ".jsonl" in source or ".ndjson" in source else "csv")
+        checkpoint = Checkpoint(options["checkpoint"] or f"{source}.checkpoint", source)
+        if not options["restart"]:
+            checkpoint.load()
+        if checkpoint.rows:
+            self.stdout.write(f"Resuming after {checkpoint.rows} rows ({checkpoint.stage} stage, byte {checkpoint.offset}).")
+
+        try:
+            stream = open_source(source)
+        except OSError as e:
+            raise CommandError(f"Cannot open {source}: {e}")
+
+        started = time.monotonic()
+        totals = {"created": 0, "updated": 0, "failed": 0}
+
+        def record(result, rows, offset):
+            created, updated, errors = result
+            totals["created"] += created
+            totals["updated"] += updated
+            totals["failed"] += len(errors)
+            for row, message in errors:
+                self.stderr.write(f"Skipped {row}: {message}")
+            checkpoint.offset = offset
+            checkpoint.rows += rows
+            checkpoint.save()
+            self.stdout.write(
+                f"{checkpoint.rows} rows ({totals['created']} created, {totals['updated']} updated, "
+                f"{totals['failed']} skipped) in {time.monotonic() - started:.0f}s"
+            )
+
+        with stream:
+            if fmt == "csv" and checkpoint.fieldnames is None:
+                header = read_rows(stream, fmt, delimiter=options["delimiter"])
+                checkpoint.fieldnames, checkpoint.start = next(header, (None, 0))
+                checkpoint.offset = checkpoint.start
+            for stage in Checkpoint.STAGES[Checkpoint.STAGES.index(checkpoint.stage):]:
+                if stage != checkpoint.stage:
+                    if not checkpoint.has_new:
+                        break
+                    checkpoint.stage, checkpoint.offset = stage, checkpoint.start
+                    checkpoint.save()
+                rows = read_rows(stream, fmt, checkpoint.offset, checkpoint.fieldnames, options["delimiter"])
+                self.run(self.batches(self.stage_rows(rows, checkpoint), options["batch_size"]), options, record)
+
+        checkpoint.clear()
+        # bulk writes send no signals: rebuild the search index and facet counts once
+        bump_generation()
+        facets.bump_version()
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {totals['created']} created, {totals['updated']} updated, {totals['failed']} skipped."
+        ))
+
+    @staticmethod
+    def run(batches, options, record):
+        if options["workers"] > 0:
+            # Children must not share the parent's database connections
+            connections.close_all()
+            window = deque()
+            with ProcessPoolExecutor(max_workers=options["workers"], initializer=init_worker) as pool:
+                for batch, offset in batches:
+                    window.append((pool.submit(import_batch, batch), len(batch), offset))
+                    # Results are taken in order, so the checkpoint only ever covers finished batches
+                    while len(window) > options["workers"] * 2 or (window and window[0][0].done()):
+                        future, count, end = window.popleft()
+                        record(future.result(), count, end)
+                while window:
+                    future, count, end = window.popleft()
+                    record(future.result(), count, end)
+        else:
+            for batch, offset in batches:
+                record(import_batch(batch), len(batch), offset)
+
+    @staticmethod
+    def stage_rows(rows, checkpoint):
+        """The rows of the checkpoint's stage, still paired with their end offsets."""
+        for row, offset in rows:
+            if in_stage(row, checkpoint.stage):
+                yield row, offset
+            elif checkpoint.stage == "ids":
+                checkpoint.has_new = True
+
+    @staticmethod
+    def batches(rows, size):
+        batch, offset = [], 0
+        for row, offset in rows:
+            batch.append(row)
+            if len(batch) >= size:
+                yield batch, offset
+                batch = []
+        if batch:
+            yield batch, offset
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from catalog.direct_uploads import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Remove direct uploads that were never attached to a product or profile and queue their S3 objects for deletion."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        removed = purge_expired(batch_size=options["batch_size"])
+        self.stdout.write(f"Removed {removed} orphaned upload(s).")
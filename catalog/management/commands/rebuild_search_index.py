@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from catalog.search import bump_generation, search_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the product search index and bump its generation in the shared "
+        "cache (SHARED_CACHE), so every worker reloads it on its next search."
+    )
+
+    def handle(self, *args, **options):
+        bump_generation()
+        count = search_index.rebuild()
+        stats = search_index.stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {count} active products ({stats['tokens']} distinct tokens)."
+        ))
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.5 on 2026-10-18 16:59
+
+from django.db import migrations, models
+
+
+def copy_primary_images(apps, schema_editor):
+    Product = apps.get_model("catalog", "Product")
+    ProductImage = apps.get_model("catalog", "ProductImage")
+    seen = set()
+    for product_id, name, data in (
+        ProductImage.objects.order_by("product_id", "-is_default", "created_at")
+        .values_list("product_id", "image", "renditions")
+        .iterator()
+    ):
+        if product_id in seen:
+            continue
+        seen.add(product_id)
+        data = data or {}
+        current = data.get("source") == name
+        Product.objects.filter(pk=product_id).update(
+            primary_image=name or "",
+            primary_image_renditions=data,
+            primary_image_width=data.get("width") if current else None,
+            primary_image_height=data.get("height") if current else None,
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog", "0006_imageblob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="primary_image",
+            field=models.CharField(
+                blank=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="primary_image_height",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="primary_image_renditions",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="primary_image_width",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(copy_primary_images, migrations.RunPython.noop),
+    ]
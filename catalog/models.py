@@ -1,10 +1,22 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import User
 from django.utils.text import slugify
+from django.utils.html import strip_tags
 from storages.backends.s3boto3 import S3Boto3Storage
 from tinymce.models import HTMLField
 from django.dispatch import receiver
-from django.db.models.signals import pre_delete
+from django.db.models.signals import post_delete, pre_delete
+from django.utils.timezone import now
+import html
+import re
+
+from utils.renditions import rendition_names
+
+
+def html_to_text(*fragments):
+    """Flatten TinyMCE HTML fragments into one whitespace-normalised plain-text string."""
+    text = " ".join(html.unescape(strip_tags(fragment or "")) for fragment in fragments)
+    return re.sub(r"\s+", " ", text).strip()
 
 
 class Category(models.Model):
@@ -20,6 +32,7 @@ class Category(models.Model):
         blank=True
     )
     include_in_home = models.BooleanField(default=True)
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     created = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(
@@ -59,6 +72,65 @@ class Category(models.Model):
         db_table = 'category'
 
 
+class ProductQuerySet(models.QuerySet):
+    def for_cards(self):
+        """
+        Everything a product card renders in one query: the category and
+        seller profile are joined, the primary image comes from the product's
+        own ``primary_image*`` columns, and the large text columns are left
+        out.
+        """
+        return self.select_related("category", "created_by__profile").defer(
+            "specification", "description", "search_document"
+        )
+
+    def refresh_primary_images(self):
+        """
+        Copies each product's primary image (the first by ``-is_default,
+        created_at``) into its ``primary_image*`` columns. Products whose
+        primary image changed get ``updated_at`` touched, so their cached
+        cards are rebuilt. The changes go out in one ``bulk_update``. Returns
+        how many products changed.
+        """
+        current = {
+            pk: state
+            for pk, *state in self.values_list(
+                "pk", "primary_image", "primary_image_renditions", "primary_image_width", "primary_image_height"
+            )
+        }
+        primary = {}
+        for product_id, name, data in (
+            ProductImage.objects.filter(product_id__in=current)
+            .order_by("product_id", "-is_default", "created_at")
+            .values_list("product_id", "image", "renditions")
+        ):
+            primary.setdefault(product_id, (name or "", data or {}))
+
+        changed = []
+        touched = now()
+        for pk, state in current.items():
+            name, data = primary.get(pk, ("", {}))
+            current_data = data.get("source") == name
+            new = [name, data, data.get("width") if current_data else None, data.get("height") if current_data else None]
+            if new != list(state):
+                changed.append(
+                    self.model(
+                        pk=pk,
+                        primary_image=new[0],
+                        primary_image_renditions=new[1],
+                        primary_image_width=new[2],
+                        primary_image_height=new[3],
+                        updated_at=touched,
+                    )
+                )
+        self.model.objects.bulk_update(
+            changed,
+            ["primary_image", "primary_image_renditions", "primary_image_width", "primary_image_height", "updated_at"],
+            batch_size=500,
+        )
+        return len(changed)
+
+
 class Product(models.Model):
     name = models.CharField(max_length=255)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
@@ -66,7 +138,16 @@ class Product(models.Model):
     brand = models.CharField(max_length=255)
     specification = HTMLField()
     description = HTMLField()
+    # Plain text of specification + description, kept in sync on save. Search
+    # reads this instead of the raw HTML.
+    search_document = models.TextField(blank=True, default="", editable=False)
     is_active = models.BooleanField(default=True)
+    # Copy of the primary ProductImage, kept in sync by the ProductImage
+    # signals, so cards render without touching the images table.
+    primary_image = models.CharField(max_length=255, blank=True, default="", editable=False)
+    primary_image_renditions = models.JSONField(default=dict, blank=True, editable=False)
+    primary_image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    primary_image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(
@@ -85,6 +166,9 @@ class Product(models.Model):
         null=True,
         blank=True
     )
+
+    objects = ProductQuerySet.as_manager()
+
     def save(self, *args, **kwargs):
         """Automatically generate a unique slug from the name."""
         if not self.slug:  # If slug is empty, generate from name
@@ -95,15 +179,26 @@ class Product(models.Model):
                 slug = f"{base_slug}-{count}"
                 count += 1
             self.slug = slug
+        self.search_document = html_to_text(self.specification, self.description)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"specification", "description"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "search_document"}
         super().save(*args, **kwargs)
 
     def default_image(self):
-        """Returns all images related to this product."""
-        return self.product_images.all().first()
+        """
+        Returns the primary image of this product, rebuilt from the
+        ``primary_image*`` columns without a query (the instance is unsaved).
+        """
+        if not self.primary_image:
+            return None
+        return ProductImage(product=self, image=self.primary_image, renditions=self.primary_image_renditions)
     
     def images(self):
-        """Returns all images related to this product."""
-        return self.product_images.all()  
+        """Returns all images related to this product, loaded once per instance."""
+        if not hasattr(self, "_images"):
+            self._images = list(self.product_images.all())
+        return self._images
 
     def __str__(self):
         return self.name
@@ -124,6 +219,10 @@ class ProductImage(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_default = models.BooleanField(default=False)
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
+    blob = models.ForeignKey(
+        "ImageBlob", on_delete=models.PROTECT, null=True, blank=True, editable=False, related_name="images"
+    )
 
     class Meta:
         ordering = ['-is_default', 'created_at']
@@ -133,18 +232,121 @@ class ProductImage(models.Model):
     def __str__(self):
         return f"Image for {self.product.name} (ID: {self.id})"
 
-    def delete(self, *args, **kwargs):
-        """Override delete to ensure the file is deleted from S3"""
-        if self.image:
-            self.image.delete()
-        super().delete(*args, **kwargs)
-
 # Signal to ensure file deletion even when bulk deleting
 @receiver(pre_delete, sender=ProductImage)
 def delete_product_image_file(sender, instance, **kwargs):
     """
-    Delete the image file from S3 when the ProductImage instance is deleted.
+    Queue the image file and its renditions for deletion from S3 when the
+    ProductImage instance is deleted, in the same transaction as the delete.
     This works even when using queryset bulk delete operations.
     """
-    if instance.image:
-        instance.image.delete(save=False)
\ No newline at end of file
+    if instance.image and not instance.blob_id:
+        StorageDeletion.enqueue(instance.image.name, *rendition_names(instance))
+
+
+@receiver(post_delete, sender=ProductImage)
+def release_product_image_blob(sender, instance, **kwargs):
+    """Shared content is only deleted from S3 together with its last ProductImage."""
+    if instance.blob_id:
+        ImageBlob.release(instance.blob_id, rendition_names(instance))
+
+
+class PendingUpload(models.Model):
+    """
+    An object a browser was allowed to upload straight to S3 but that has not
+    been attached to a ProductImage or profile picture yet. Rows left past
+    ``expires_at`` are removed with their objects by ``purge_pending_uploads``.
+    """
+    PRODUCT_IMAGE = "product_image"
+    PROFILE_PICTURE = "profile_picture"
+    PURPOSE_CHOICES = [
+        (PRODUCT_IMAGE, "Product image"),
+        (PROFILE_PICTURE, "Profile picture"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="pending_uploads")
+    purpose = models.CharField(max_length=20, choices=PURPOSE_CHOICES)
+    key = models.CharField(max_length=255, unique=True)
+    original_name = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.get_purpose_display()} upload by {self.user} ({self.key})"
+
+
+class StorageDeletion(models.Model):
+    """
+    Outbox of S3 objects to delete. Rows are written in the same transaction
+    as the rows that referenced the objects, so deleting a product or a
+    picture never waits on S3, and ``drain_storage_deletions`` removes them
+    in batches, retrying failures with a backoff.
+    """
+    name = models.CharField(max_length=255)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    available_at = models.DateTimeField(default=now, db_index=True)
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def enqueue(cls, *names):
+        names = [name for name in names if name]
+        if names:
+            cls.objects.bulk_create([cls(name=name) for name in names])
+
+
+class ImageBlob(models.Model):
+    """
+    One stored copy of a product image's content, identified by its SHA-256.
+    Every ProductImage with the same content points at the same blob, and
+    ``ref_count`` tracks how many do, so the object and its renditions are
+    deleted only when the last of them goes.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} references)"
+
+    @classmethod
+    def reference(cls, sha256, size, name):
+        """
+        Counts one more reference to the blob holding ``sha256``, creating it
+        at ``name`` when the content is new. Returns ``(blob, created)``; the
+        caller must have stored the object at ``name`` when ``created``.
+        ``name`` must never have belonged to another blob (see
+        ``blobs.blob_name``): once a blob is released its object may be
+        deleted by a drain at any time.
+        """
+        for _ in range(3):
+            try:
+                with transaction.atomic():
+                    blob = cls.objects.select_for_update().filter(sha256=sha256).first()
+                    if blob is not None:
+                        cls.objects.filter(pk=blob.pk).update(ref_count=models.F("ref_count") + 1)
+                        blob.ref_count += 1
+                        return blob, False
+                    return cls.objects.create(sha256=sha256, size=size, name=name, ref_count=1), True
+            except IntegrityError:
+                continue  # created concurrently; count a reference to that one instead
+        raise IntegrityError(f"Could not reference blob {sha256}")
+
+    @classmethod
+    def release(cls, pk, rendition_names=()):
+        """Drops one reference; the last one queues the object and ``rendition_names`` for deletion."""
+        with transaction.atomic():
+            blob = cls.objects.select_for_update().filter(pk=pk).first()
+            if blob is None:
+                return
+            if blob.ref_count > 1:
+                cls.objects.filter(pk=pk).update(ref_count=models.F("ref_count") - 1)
+                return
+            StorageDeletion.enqueue(blob.name, *rendition_names)
+            blob.delete()
@@ -0,0 +1,91 @@
+import base64
+import binascii
+import heapq
+import json
+import math
+
+
+def encode_cursor(*values):
+    """Opaque, URL-safe token for the sort key of the last item on a page."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Returns the values packed by ``encode_cursor`` or None for a missing/garbled token."""
+    if not token:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        return None
+    return values if isinstance(values, list) and values else None
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated listing. There is deliberately no page
+    count: producing one would need a COUNT(*) over the whole result set.
+    """
+
+    def __init__(self, object_list, cursor=None, next_cursor=None):
+        self.object_list = object_list
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def is_first(self):
+        return not self.cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def paginate_by_pk(queryset, cursor, size):
+    """
+    Newest-first page of ``queryset`` keyed on the primary key, so page 500
+    is a ``WHERE id < ?`` range scan just like page 1.
+    """
+    after = decode_cursor(cursor)
+    if after and isinstance(after[0], int):
+        queryset = queryset.filter(pk__lt=after[0])
+    else:
+        cursor = None
+    rows = list(queryset.order_by("-pk")[:size + 1])
+    next_cursor = encode_cursor(rows[size - 1].pk) if len(rows) > size else None
+    return KeysetPage(rows[:size], cursor, next_cursor)
+
+
+def _is_ranked_cursor(values):
+    """A tampered ``(score, pk)`` would fail to compare with real hits, or match none."""
+    if not values or len(values) != 2:
+        return False
+    score, pk = values
+    return (
+        isinstance(score, (int, float)) and not isinstance(score, bool) and math.isfinite(score)
+        and isinstance(pk, int) and not isinstance(pk, bool)
+    )
+
+
+def paginate_ranked(scores, cursor, size):
+    """
+    Page of ids from a ``{pk: score}`` mapping in descending ``(score, pk)``
+    order. The cursor is the ``(score, pk)`` of the last hit shown, so new
+    or removed hits between requests never shift or repeat later pages.
+    """
+    after = decode_cursor(cursor)
+    items = scores.items()
+    if _is_ranked_cursor(after):
+        bound = (after[0], after[1])
+        items = (item for item in items if (item[1], item[0]) < bound)
+    else:
+        cursor = None
+    top = heapq.nlargest(size + 1, items, key=lambda item: (item[1], item[0]))
+    next_cursor = encode_cursor(top[size - 1][1], top[size - 1][0]) if len(top) > size else None
+    return KeysetPage([pk for pk, _ in top[:size]], cursor, next_cursor)
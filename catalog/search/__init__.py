@@ -0,0 +1,17 @@
+from .index import SearchIndex, bump_generation, current_generation, hold_generation, search_index, tokenize
+from .ranking import BM25
+from .results import ResultCache, result_cache
+from .trigram import TrigramIndex
+
+__all__ = [
+    "BM25",
+    "ResultCache",
+    "SearchIndex",
+    "TrigramIndex",
+    "bump_generation",
+    "current_generation",
+    "hold_generation",
+    "result_cache",
+    "search_index",
+    "tokenize",
+]
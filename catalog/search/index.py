@@ -0,0 +1,395 @@
+import bisect
+import heapq
+import logging
+import threading
+import time
+from collections import Counter, namedtuple
+
+from django.conf import settings
+from django.db import connection
+from django.utils.timezone import now
+
+from utils.cache import shared_cache
+
+from .ranking import BM25, FIELDS
+from .suggest import SuggestionIndex
+from .text import tokenize
+from .trigram import TrigramIndex
+
+logger = logging.getLogger(__name__)
+
+# Fields whose words feed the typo-tolerant trigram index (name, brand, category).
+FUZZY_FIELDS = 3
+GENERATION_KEY = "catalog:search:generation"
+
+# The generation read during the current request, see ``hold_generation``.
+_request = threading.local()
+
+# What the index remembers about each product besides its postings.
+Document = namedtuple("Document", ["lengths", "tokens", "category_id", "brand"])
+
+
+def bump_generation():
+    """
+    Tell every worker that its copy of the index must be rebuilt. The counter
+    lives in the shared cache, so bumps from management commands reach the
+    web workers too.
+    """
+    cache = shared_cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+    _request.generation = None
+
+
+def hold_generation(active):
+    """
+    Called on request_started/request_finished: while a request is running,
+    ``current_generation()`` asks the shared cache once and reuses the answer.
+    """
+    _request.active = active
+    _request.generation = None
+
+
+def current_generation():
+    generation = getattr(_request, "generation", None)
+    if generation is None:
+        generation = shared_cache().get(GENERATION_KEY, 0)
+        if getattr(_request, "active", False):
+            _request.generation = generation
+    return generation
+
+
+def product_fields(product):
+    """Returns one token list per entry of ``FIELDS`` for a product."""
+    return (
+        tokenize(product.name),
+        tokenize(product.brand),
+        tokenize(product.category.name),
+        tokenize(product.search_document),
+    )
+
+
+def field_statistics(fields):
+    """Collapse per-field token lists into ``{token: tf-per-field}`` and field lengths."""
+    frequencies = {}
+    for position, tokens in enumerate(fields):
+        for token in tokens:
+            counts = frequencies.setdefault(token, [0] * len(FIELDS))
+            counts[position] += 1
+    return {token: tuple(counts) for token, counts in frequencies.items()}, tuple(len(tokens) for tokens in fields)
+
+
+class SearchIndex:
+    """
+    In-process inverted index over active products.
+
+    Postings keep per-field term frequencies and every document keeps its
+    field lengths, so BM25 ranking runs entirely on precomputed statistics
+    without re-reading product HTML; only the plain-text ``search_document``
+    column is ever loaded. Words from names, brands and categories
+    also go into a trigram index that serves misspelled queries when exact
+    matches are sparse, and the labels themselves into a prefix index that
+    serves search-box autocomplete.
+
+    Every worker keeps its own copy. Saves handled by this process are applied
+    immediately; saves made by other processes are picked up by a periodic
+    ``updated_at`` delta sync. Changes a delta sync cannot see (category
+    renames, manual rebuilds) bump a generation in the shared cache, which
+    forces a full rebuild on the next query. Products deleted elsewhere may
+    linger until the next rebuild, so callers always hydrate hits through an
+    ``is_active`` queryset.
+    """
+
+    def __init__(self, scorer=None):
+        self._lock = threading.RLock()
+        self._scorer = scorer
+        self._postings = {}  # token -> {product id: tf per field}
+        self._documents = {}  # product id -> Document
+        self._field_totals = [0] * len(FIELDS)
+        self._vocabulary = []  # sorted tokens, used for prefix matching
+        self._fuzzy = TrigramIndex()
+        self._suggestions = SuggestionIndex()
+        self._built = False
+        self._refreshing = False
+        self._generation = None
+        self._synced_at = None
+        self._checked_at = 0.0
+        self._rebuilt_at = 0.0
+
+    @property
+    def scorer(self):
+        if self._scorer is None:
+            self._scorer = BM25.from_settings()
+        return self._scorer
+
+    # ------------------------------------------------------------------ build
+    def _queryset(self):
+        from catalog.models import Product
+
+        return (
+            Product.objects.filter(is_active=True)
+            .select_related("category")
+            .only("id", "name", "brand", "search_document", "is_active", "updated_at",
+                  "category_id", "category__name", "category__slug")
+        )
+
+    def rebuild(self):
+        """Drop everything and index all active products from the database."""
+        started = now()
+        generation = current_generation()
+        postings, documents = {}, {}
+        totals = [0] * len(FIELDS)
+        fuzzy = TrigramIndex()
+        suggestions = SuggestionIndex()
+        for product in self._queryset().iterator(chunk_size=2000):
+            suggestions.add(product.pk, product, bulk=True)
+            frequencies, lengths = field_statistics(product_fields(product))
+            documents[product.pk] = Document(lengths, frozenset(frequencies), product.category_id, product.brand)
+            for position, length in enumerate(lengths):
+                totals[position] += length
+            for token, counts in frequencies.items():
+                postings.setdefault(token, {})[product.pk] = counts
+                if any(counts[:FUZZY_FIELDS]):
+                    fuzzy.add(token)
+        suggestions.finish_bulk()
+
+        with self._lock:
+            self._postings = postings
+            self._documents = documents
+            self._field_totals = totals
+            self._vocabulary = sorted(postings)
+            self._fuzzy = fuzzy
+            self._suggestions = suggestions
+            self._built = True
+            self._generation = generation
+            self._synced_at = started
+            self._checked_at = self._rebuilt_at = time.monotonic()
+        logger.info("Search index rebuilt with %s products and %s tokens", len(documents), len(postings))
+        return len(documents)
+
+    def _ensure_fresh(self):
+        max_age = getattr(settings, "SEARCH_INDEX_REBUILD_INTERVAL", 3600)
+        if (
+            not self._built
+            or self._generation != current_generation()
+            or time.monotonic() - self._rebuilt_at > max_age
+        ):
+            self.rebuild()
+            return
+
+        interval = getattr(settings, "SEARCH_INDEX_SYNC_INTERVAL", 30)
+        if time.monotonic() - self._checked_at < interval:
+            return
+
+        from catalog.models import Product
+
+        started = now()
+        with self._lock:
+            since = self._synced_at
+            self._checked_at = time.monotonic()
+        changed = (
+            Product.objects.filter(updated_at__gte=since)
+            .select_related("category")
+            .defer("specification", "description")
+        )
+        for product in changed:
+            self.update(product)
+        with self._lock:
+            self._synced_at = started
+
+    # ---------------------------------------------------------- incremental
+    def update(self, product):
+        """(Re)index one product, or drop it if it is no longer active."""
+        if not product.is_active:
+            self.remove(product.pk)
+            return
+        frequencies, lengths = field_statistics(product_fields(product))
+        with self._lock:
+            if not self._built:
+                return
+            self._drop(product.pk)
+            self._suggestions.add(product.pk, product)
+            self._documents[product.pk] = Document(lengths, frozenset(frequencies), product.category_id, product.brand)
+            for position, length in enumerate(lengths):
+                self._field_totals[position] += length
+            for token, counts in frequencies.items():
+                postings = self._postings.get(token)
+                if postings is None:
+                    self._postings[token] = {product.pk: counts}
+                    bisect.insort(self._vocabulary, token)
+                else:
+                    postings[product.pk] = counts
+                if any(counts[:FUZZY_FIELDS]):
+                    self._fuzzy.add(token)
+
+    def category_of(self, pk):
+        """Category id the product was last indexed under, if this worker knows it."""
+        with self._lock:
+            document = self._documents.get(pk)
+            return document.category_id if document else None
+
+    def remove(self, pk):
+        with self._lock:
+            self._drop(pk)
+
+    def _drop(self, pk):
+        self._suggestions.discard(pk)
+        document = self._documents.pop(pk, None)
+        if document is None:
+            return
+        for position, length in enumerate(document.lengths):
+            self._field_totals[position] -= length
+        for token in document.tokens:
+            postings = self._postings[token]
+            del postings[pk]
+            if not postings:
+                del self._postings[token]
+                position = bisect.bisect_left(self._vocabulary, token)
+                if position < len(self._vocabulary) and self._vocabulary[position] == token:
+                    del self._vocabulary[position]
+
+    # ----------------------------------------------------------------- query
+    def _expand(self, token, fuzzy=False):
+        """
+        Yields ``(indexed token, weight)`` pairs for a query token: the token
+        itself, tokens it is a prefix of ('lap' finds 'laptop'), and with
+        ``fuzzy`` also similarly spelled name/brand/category words.
+        """
+        scorer = self.scorer
+        seen = set()
+        position = bisect.bisect_left(self._vocabulary, token)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(token):
+            term = self._vocabulary[position]
+            seen.add(term)
+            yield term, 1.0 if term == token else scorer.prefix_penalty
+            position += 1
+
+        if fuzzy and len(token) >= 3:
+            threshold = getattr(settings, "SEARCH_FUZZY_THRESHOLD", 0.3)
+            for term, similarity in self._fuzzy.similar(token, threshold):
+                if term not in seen and term in self._postings:
+                    yield term, similarity * scorer.fuzzy_penalty
+
+    def score(self, query, fuzzy=False):
+        """Returns ``{product id: BM25 score}`` for products matching every query token."""
+        tokens = tokenize(query)
+        if not tokens:
+            return {}
+        self._ensure_fresh()
+        scorer = self.scorer
+
+        with self._lock:
+            documents = self._documents
+            count = len(documents) or 1
+            averages = [total / count for total in self._field_totals]
+            scores = None
+            for token in dict.fromkeys(tokens):
+                token_scores = {}
+                for term, factor in self._expand(token, fuzzy):
+                    postings = self._postings[term]
+                    idf = scorer.idf(len(postings), count)
+                    for pk, frequencies in postings.items():
+                        if scores is not None and pk not in scores:
+                            continue
+                        value = factor * scorer.score(frequencies, documents[pk].lengths, averages, idf)
+                        if value > token_scores.get(pk, 0.0):
+                            token_scores[pk] = value
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {pk: scores[pk] + value for pk, value in token_scores.items()}
+                if not scores:
+                    return {}
+            return scores
+
+    def scores(self, query):
+        """
+        ``score()`` with the typo-tolerant fallback: when fewer than
+        ``SEARCH_FUZZY_MIN_RESULTS`` products match exactly, the query is
+        re-scored with fuzzy expansions.
+        """
+        scores = self.score(query)
+        if len(scores) < getattr(settings, "SEARCH_FUZZY_MIN_RESULTS", 5):
+            scores = self.score(query, fuzzy=True)
+        return scores
+
+    def restrict(self, scores, category_id=None, brand=None):
+        """Filter a ``scores()`` result to one category and/or brand (case-insensitive)."""
+        if category_id is None and not brand:
+            return scores
+        brand = brand.strip().casefold() if brand else None
+        with self._lock:
+            documents = self._documents
+            return {
+                pk: value
+                for pk, value in scores.items()
+                if pk in documents
+                and (category_id is None or documents[pk].category_id == category_id)
+                and (brand is None or documents[pk].brand.strip().casefold() == brand)
+            }
+
+    def facet_pairs(self, scores):
+        """Counts hits per ``(category id, brand)`` for facet navigation."""
+        with self._lock:
+            documents = self._documents
+            return Counter(
+                (documents[pk].category_id, documents[pk].brand) for pk in scores if pk in documents
+            )
+
+    def search(self, query, limit=None):
+        """Returns matching product ids, best BM25 score first."""
+        ranked = self.scores(query).items()
+        key = lambda item: (item[1], item[0])  # noqa: E731 - newest product wins ties
+        if limit is not None:
+            ranked = heapq.nlargest(limit, ranked, key=key)
+        else:
+            ranked = sorted(ranked, key=key, reverse=True)
+        return [pk for pk, _ in ranked]
+
+    def _refresh_in_background(self):
+        """
+        Runs ``_ensure_fresh`` on a thread of its own when a sync is due, so
+        the caller answers from what is already indexed without waiting on the
+        database or the shared cache.
+        """
+        interval = getattr(settings, "SEARCH_INDEX_SYNC_INTERVAL", 30)
+        with self._lock:
+            if self._refreshing or (self._built and time.monotonic() - self._checked_at < interval):
+                return
+            self._refreshing = True
+
+        def refresh():
+            try:
+                self._ensure_fresh()
+            except Exception:
+                logger.exception("Refreshing the search index failed")
+            finally:
+                with self._lock:
+                    self._refreshing = False
+                connection.close()
+
+        threading.Thread(target=refresh, name="search-index-refresh", daemon=True).start()
+
+    def suggest(self, text, limit=10):
+        """
+        Autocomplete suggestions for partially typed ``text``. Never touches
+        the database: syncs run in the background, and a worker that has not
+        built its index yet suggests nothing until it has.
+        """
+        self._refresh_in_background()
+        with self._lock:
+            return self._suggestions.suggest(text, limit)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "products": len(self._documents),
+                "tokens": len(self._postings),
+                "fuzzy_words": len(self._fuzzy),
+                "suggestions": len(self._suggestions),
+            }
+
+
+search_index = SearchIndex()
@@ -0,0 +1,50 @@
+import math
+
+from django.conf import settings
+
+# Product fields in the order their statistics are stored in the index.
+FIELDS = ("name", "brand", "category", "document")
+
+DEFAULT_FIELD_WEIGHTS = {
+    "name": 3.0,
+    "brand": 2.5,
+    "category": 1.5,
+    "document": 1.0,  # Product.search_document: specification + description
+}
+
+
+class BM25:
+    """
+    BM25F scorer: per-field term frequencies are length-normalised against the
+    field's average length, weighted, summed, and then saturated once.
+    """
+
+    def __init__(self, weights=None, k1=1.2, b=0.75, prefix_penalty=0.7, fuzzy_penalty=0.5):
+        weights = {**DEFAULT_FIELD_WEIGHTS, **(weights or {})}
+        self.weights = tuple(weights[field] for field in FIELDS)
+        self.k1 = k1
+        self.b = b
+        self.prefix_penalty = prefix_penalty
+        self.fuzzy_penalty = fuzzy_penalty
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            weights=getattr(settings, "SEARCH_FIELD_WEIGHTS", None),
+            k1=getattr(settings, "SEARCH_BM25_K1", 1.2),
+            b=getattr(settings, "SEARCH_BM25_B", 0.75),
+        )
+
+    @staticmethod
+    def idf(document_frequency, document_count):
+        return math.log(1 + (document_count - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def score(self, frequencies, lengths, averages, idf):
+        """Score one term in one document from precomputed statistics."""
+        tf = 0.0
+        for weight, frequency, length, average in zip(self.weights, frequencies, lengths, averages):
+            if frequency:
+                norm = 1 - self.b + self.b * (length / average if average else 1)
+                tf += weight * frequency / norm
+        return idf * tf * (self.k1 + 1) / (self.k1 + tf)
+
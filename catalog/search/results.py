@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from utils.cache import shared_cache
+
+from .index import current_generation
+from .text import tokenize
+
+VERSION_KEY = "catalog:search:results:{}"
+ALL = "all"
+
+
+def _version_key(category_id):
+    return VERSION_KEY.format(ALL if category_id is None else f"category:{category_id}")
+
+
+def invalidate(*category_ids):
+    """
+    Drop cached result pages that may contain products of ``category_ids``.
+    Unfiltered searches span every category, so they are always dropped too.
+    The versions live in the shared cache so every worker sees the change.
+    """
+    for key in {_version_key(None), *(_version_key(pk) for pk in category_ids if pk is not None)}:
+        try:
+            shared_cache().incr(key)
+        except ValueError:
+            shared_cache().set(key, 1, None)
+
+
+class ResultCache:
+    """
+    Per-process LRU of search result pages. An entry holds only the ordered
+    product ids of one page plus its cursors, keyed on the normalized query,
+    category, brand and cursor. Entries expire after ``timeout`` seconds and
+    are ignored once the version of the category they were filtered on (or the
+    search index generation) has moved on.
+    """
+
+    def __init__(self, size=None, timeout=None):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = size
+        self._timeout = timeout
+
+    @property
+    def size(self):
+        return self._size if self._size is not None else getattr(settings, "SEARCH_RESULT_CACHE_SIZE", 512)
+
+    @property
+    def timeout(self):
+        return self._timeout if self._timeout is not None else getattr(settings, "SEARCH_RESULT_CACHE_TIMEOUT", 300)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(query, category_id=None, brand=None, cursor=None):
+        return (" ".join(tokenize(query)), category_id, (brand or "").strip().casefold(), cursor or "")
+
+    @staticmethod
+    def versions(category_id):
+        return current_generation(), shared_cache().get(_version_key(category_id), 0)
+
+    def get(self, key, versions):
+        """
+        Returns ``(ids, cursor, next_cursor)`` or None on a miss. ``versions``
+        comes from ``versions()`` and should be read before the results are
+        computed, so a change made meanwhile is never cached as current.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, entry_versions, page = entry
+            if expires < time.monotonic() or entry_versions != versions:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return page
+
+    def set(self, key, versions, ids, cursor=None, next_cursor=None):
+        entry = (time.monotonic() + self.timeout, versions, (tuple(ids), cursor, next_cursor))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+result_cache = ResultCache()
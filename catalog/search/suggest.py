@@ -0,0 +1,86 @@
+import bisect
+from collections import Counter
+
+from .text import tokenize
+
+# Suggestion kinds, in the order they are listed to the user.
+KINDS = ("category", "brand", "product")
+
+
+def suggestion_keys(label):
+    """A label is reachable by typing the start of any of its words."""
+    words = tokenize(label)
+    return {" ".join(words[position:]) for position in range(len(words))}
+
+
+class SuggestionIndex:
+    """
+    Sorted-array prefix index of product names, brands and category names.
+
+    Each distinct ``(kind, label, slug)`` entry keeps a count of the active
+    products behind it. New entries are spliced into the sorted key list with
+    ``bisect.insort``; entries whose count drops to zero are skipped at query
+    time and compacted away on the next full rebuild. Not thread-safe on its
+    own; ``SearchIndex`` calls it under its lock.
+    """
+
+    def __init__(self):
+        self._entries = {}  # product id -> entries it contributes
+        self._counts = Counter()
+        self._keyed = set()  # entries that already have keys in _keys
+        self._keys = []  # sorted (key, kind, label, slug)
+
+    def __len__(self):
+        return sum(1 for count in self._counts.values() if count > 0)
+
+    @staticmethod
+    def product_entries(product):
+        category = product.category
+        return (
+            ("category", category.name, category.slug),
+            ("brand", product.brand.strip(), ""),
+            ("product", product.name.strip(), ""),
+        )
+
+    def add(self, pk, product, bulk=False):
+        entries = tuple(entry for entry in self.product_entries(product) if entry[1])
+        self._entries[pk] = entries
+        for entry in entries:
+            self._counts[entry] += 1
+            if entry not in self._keyed:
+                self._keyed.add(entry)
+                for key in suggestion_keys(entry[1]):
+                    if bulk:
+                        self._keys.append((key, *entry))
+                    else:
+                        bisect.insort(self._keys, (key, *entry))
+
+    def finish_bulk(self):
+        self._keys.sort()
+
+    def discard(self, pk):
+        for entry in self._entries.pop(pk, ()):
+            self._counts[entry] -= 1
+            if self._counts[entry] <= 0:
+                del self._counts[entry]
+
+    def suggest(self, text, limit=10, scan=500):
+        """Returns up to ``limit`` suggestion dicts for the typed ``text``."""
+        prefix = " ".join(tokenize(text))
+        if not prefix:
+            return []
+        found = {}
+        position = bisect.bisect_left(self._keys, (prefix,))
+        end = min(len(self._keys), position + scan)
+        while position < end and self._keys[position][0].startswith(prefix):
+            entry = self._keys[position][1:]
+            count = self._counts.get(entry, 0)
+            if count > 0:
+                found[entry] = count
+            position += 1
+
+        ranked = sorted(found.items(), key=lambda item: (KINDS.index(item[0][0]), -item[1], item[0][1]))
+        return [
+            {"type": kind, "label": label, "slug": slug, "count": count}
+            for (kind, label, slug), count in ranked[:limit]
+        ]
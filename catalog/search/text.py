@@ -0,0 +1,13 @@
+import html
+import re
+
+from django.utils.html import strip_tags
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    """Split text (plain or HTML) into lower-case word tokens."""
+    if not text:
+        return []
+    return TOKEN_RE.findall(html.unescape(strip_tags(str(text))).casefold())
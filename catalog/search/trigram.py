@@ -0,0 +1,70 @@
+import threading
+from array import array
+from collections import Counter
+
+
+def trigrams(word):
+    """pg_trgm style trigrams: two leading blanks and one trailing blank."""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    Trigram index over the words of product names, brands and category names,
+    used to find vocabulary words that are spelled *like* a query token.
+
+    Words get dense integer ids in insertion order, so every trigram's posting
+    list is an ``array('I')`` that stays sorted by simply appending. Words are
+    never removed individually; a word that no longer matches any product just
+    resolves to nothing in the main index until the next rebuild.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self._words = []
+        self._ids = {}
+        self._sizes = array("H")  # trigram count per word id
+        self._postings = {}  # trigram -> array('I') of word ids
+
+    def __len__(self):
+        return len(self._words)
+
+    def add(self, word):
+        if word in self._ids:
+            return
+        grams = trigrams(word)
+        with self._lock:
+            if word in self._ids:
+                return
+            word_id = len(self._words)
+            self._words.append(word)
+            self._ids[word] = word_id
+            self._sizes.append(min(len(grams), 0xFFFF))
+            for gram in grams:
+                postings = self._postings.get(gram)
+                if postings is None:
+                    self._postings[gram] = array("I", (word_id,))
+                else:
+                    postings.append(word_id)
+
+    def similar(self, word, threshold=0.3, limit=10):
+        """Returns ``[(word, similarity), ...]`` above ``threshold``, best first."""
+        grams = trigrams(word)
+        shared = Counter()
+        with self._lock:
+            for gram in grams:
+                postings = self._postings.get(gram)
+                if postings is not None:
+                    shared.update(postings)
+            words, sizes = self._words, self._sizes
+            matches = []
+            for word_id, common in shared.items():
+                similarity = common / (len(grams) + sizes[word_id] - common)
+                if similarity >= threshold and words[word_id] != word:
+                    matches.append((words[word_id], similarity))
+        matches.sort(key=lambda match: match[1], reverse=True)
+        return matches[:limit]
@@ -0,0 +1,88 @@
+from django.core.signals import request_finished, request_started
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from utils import renditions
+
+from . import categories, facets
+from .models import Category, Product, ProductImage
+from .search import bump_generation, hold_generation, results, search_index
+
+# Sent with ``pks=[...]`` after queryset.update() calls that bypass save(),
+# e.g. the activate/deactivate actions in ProductAdmin.
+products_changed = Signal()
+
+
+@receiver(request_started)
+def start_request(sender, **kwargs):
+    """The search generation is read once per request, however often it is checked."""
+    hold_generation(True)
+
+
+@receiver(request_finished)
+def finish_request(sender, **kwargs):
+    hold_generation(False)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    """Keep the search index, cached result pages and facet counts in step with product edits."""
+    previous_category = search_index.category_of(instance.pk)
+    search_index.update(instance)
+    results.invalidate(instance.category_id, previous_category)
+    facets.bump_version()
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    search_index.remove(instance.pk)
+    results.invalidate(instance.category_id)
+    facets.bump_version()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    """A renamed category changes the tokens of every product in it, and the cached category list."""
+    if not kwargs.get("created"):
+        bump_generation()
+    results.invalidate(instance.pk)
+    facets.bump_version()
+    categories.bump_version()
+
+
+@receiver(products_changed)
+def reindex_products(sender, pks, **kwargs):
+    products = Product.objects.filter(pk__in=pks).select_related("category").defer("specification", "description")
+    for product in products:
+        search_index.update(product)
+    results.invalidate(*{product.category_id for product in products})
+    facets.bump_version()
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=Category)
+def image_saved(sender, instance, **kwargs):
+    """New or replaced images get their thumbnails and WebP variants off the request path."""
+    if renditions.needs_renditions(instance):
+        renditions.schedule(sender, [instance.image.name])
+
+
+@receiver(renditions.renditions_ready, sender=Category)
+def category_renditions_ready(sender, **kwargs):
+    categories.bump_version()
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def primary_image_changed(sender, instance, **kwargs):
+    """Keep the product's copy of its primary image current (not needed when the product itself goes)."""
+    origin = kwargs.get("origin")
+    if isinstance(origin, Product) or getattr(origin, "model", None) is Product:
+        return
+    Product.objects.filter(pk=instance.product_id).refresh_primary_images()
+
+
+@receiver(renditions.renditions_ready, sender=ProductImage)
+def product_renditions_ready(sender, names, **kwargs):
+    Product.objects.filter(product_images__image__in=names).distinct().refresh_primary_images()
@@ -0,0 +1,18 @@
+from django import template
+
+from utils.renditions import rendition_url
+
+register = template.Library()
+
+
+@register.filter
+def rendition(instance, spec):
+    """
+    URL of a resized variant of ``instance.image``: ``{{ image|rendition:"card" }}``
+    for WebP, ``{{ image|rendition:"card.jpeg" }}`` for the JPEG fallback.
+    Falls back to the original until the variants exist.
+    """
+    if not instance:
+        return ""
+    size, _, fmt = spec.partition(".")
+    return rendition_url(instance, size, fmt or "webp")
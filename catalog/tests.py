@@ -1,3 +1,626 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import boto3
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import now
+from moto import mock_aws
+
+from customer.tracking import ProductViewBuffer
+
+from . import cards, categories, deletions, exporter, importer, views
+from .direct_uploads import UploadError, claim, presign
+from .models import Category, ImageBlob, PendingUpload, Product, ProductImage, StorageDeletion
+from .pagination import encode_cursor, paginate_ranked
+from .search import (
+    BM25,
+    ResultCache,
+    SearchIndex,
+    TrigramIndex,
+    bump_generation,
+    current_generation,
+    results,
+    search_index,
+)
+from .uploads import upload_product_images
+
+
+class CatalogDataMixin:
+    """A seller and two categories, plus a shortcut for creating products."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.laptops = Category.objects.create(name="Laptops")
+        cls.phones = Category.objects.create(name="Phones")
+
+    @classmethod
+    def product(cls, name, brand="Acme", category=None, specification="", description="", **fields):
+        return Product.objects.create(
+            name=name, brand=brand, category=category or cls.laptops, specification=specification,
+            description=description, created_by=cls.seller, **fields,
+        )
+
+
+class SearchRankingTests(CatalogDataMixin, TestCase):
+    def search(self, query):
+        index = SearchIndex(scorer=BM25())
+        index.rebuild()
+        return index.search(query)
+
+    def test_a_match_in_the_name_outranks_one_in_the_description(self):
+        described = self.product("Travel Bag", description="<p>Fits a <b>gaming</b> laptop</p>")
+        named = self.product("Gaming Mouse")
+        self.assertEqual(self.search("gaming"), [named.pk, described.pk])
+
+    def test_every_query_word_must_match(self):
+        mouse = self.product("Gaming Mouse", brand="Logitech")
+        self.product("Gaming Chair")
+        self.assertEqual(self.search("gaming logitech"), [mouse.pk])
+        self.assertEqual(self.search("gaming sony"), [])
+
+    def test_typed_prefixes_match_whole_words(self):
+        laptop = self.product("Zenbook", category=self.laptops)
+        self.product("Pixel", category=self.phones)
+        self.assertEqual(self.search("lap"), [laptop.pk])
+
+    def test_inactive_products_are_not_indexed(self):
+        self.product("Gaming Mouse", is_active=False)
+        self.assertEqual(self.search("gaming"), [])
+
+    def test_repeated_and_rare_terms_score_higher(self):
+        scorer = BM25()
+        averages = (2.0, 1.0, 1.0, 10.0)
+        once = scorer.score((1, 0, 0, 0), (2, 1, 1, 10), averages, scorer.idf(1, 10))
+        twice = scorer.score((2, 0, 0, 0), (2, 1, 1, 10), averages, scorer.idf(1, 10))
+        common = scorer.score((1, 0, 0, 0), (2, 1, 1, 10), averages, scorer.idf(9, 10))
+        in_document = scorer.score((0, 0, 0, 1), (2, 1, 1, 10), averages, scorer.idf(1, 10))
+        self.assertGreater(twice, once)
+        self.assertGreater(once, common)
+        self.assertGreater(once, in_document)
+
+
+class FuzzySearchTests(CatalogDataMixin, TestCase):
+    def setUp(self):
+        self.keyboard = self.product("Mechanical Keyboard", brand="Corsair")
+        self.index = SearchIndex(scorer=BM25())
+        self.index.rebuild()
+
+    def test_misspelled_words_fall_back_to_similar_names(self):
+        self.assertEqual(self.index.score("keybaord"), {})
+        self.assertEqual(self.index.search("keybaord"), [self.keyboard.pk])
+        self.assertEqual(self.index.search("corsiar"), [self.keyboard.pk])
+
+    def test_fuzzy_matches_rank_below_exact_ones(self):
+        misspelled = self.product("Keybord Cover")
+        self.index.rebuild()
+        self.assertEqual(self.index.search("keyboard"), [self.keyboard.pk, misspelled.pk])
+
+    @override_settings(SEARCH_FUZZY_MIN_RESULTS=1)
+    def test_enough_exact_matches_skip_the_fallback(self):
+        self.product("Keybird Lamp")
+        self.index.rebuild()
+        self.assertEqual(self.index.search("keyboard"), [self.keyboard.pk])
+
+    def test_description_words_are_not_fuzzy_matched(self):
+        self.product("Desk", description="ergonomic")
+        self.index.rebuild()
+        self.assertEqual(self.index.search("ergonomik"), [])
+
+    def test_trigram_similarity(self):
+        words = TrigramIndex()
+        for word in ("laptop", "laptops", "lapdog", "phone"):
+            words.add(word)
+        similar = dict(words.similar("laptpo"))
+        self.assertIn("laptop", similar)
+        self.assertNotIn("phone", similar)
+        self.assertEqual(words.similar("laptop", threshold=0.5)[0][0], "laptops")
+
+
+class AutocompleteTests(CatalogDataMixin, TestCase):
+    def setUp(self):
+        self.product("Lenovo Legion", brand="Lenovo")
+        self.product("ThinkPad", brand="Lenovo")
+        self.product("Pixel", brand="Google", category=self.phones)
+        search_index.rebuild()
+        self.addCleanup(search_index.__init__)  # leave the process-wide index unbuilt again
+        self.client.force_login(self.seller)
+
+    def test_suggestions_list_categories_then_brands_then_products(self):
+        suggestions = search_index.suggest("l")
+        self.assertEqual(
+            [(entry["type"], entry["label"], entry["count"]) for entry in suggestions],
+            [("category", "Laptops", 2), ("brand", "Lenovo", 2), ("product", "Lenovo Legion", 1)],
+        )
+
+    def test_any_word_of_a_label_can_be_typed(self):
+        self.assertEqual([entry["label"] for entry in search_index.suggest("legi")], ["Lenovo Legion"])
+
+    def test_deactivated_products_drop_out(self):
+        pixel = Product.objects.get(name="Pixel")
+        pixel.is_active = False
+        pixel.save()
+        self.assertEqual(search_index.suggest("pix"), [])
+        self.assertEqual(search_index.suggest("phones"), [])
+
+    def test_endpoint_links_to_the_product_list_without_catalog_queries(self):
+        # only login_required's session and user lookups
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("catalog:autocomplete"), {"q": "Goo"})
+        self.assertEqual(response.json(), {
+            "query": "Goo",
+            "suggestions": [{"type": "brand", "label": "Google", "count": 1, "url": "/product/list/?q=Google"}],
+        })
+        category = self.client.get(reverse("catalog:autocomplete"), {"q": "phon"}).json()["suggestions"][0]
+        self.assertEqual(category["url"], "/product/list/?category=phones")
+
+
+class SearchDocumentTests(CatalogDataMixin, TestCase):
+    def test_save_keeps_a_plain_text_copy_of_the_html(self):
+        product = self.product(
+            "Laptop", specification="<p>16GB&nbsp;RAM</p>\n<ul><li>1TB</li></ul>", description="<b>Fast</b> &amp; light",
+        )
+        self.assertEqual(product.search_document, "16GB RAM 1TB Fast & light")
+
+        product.description = "<i>Quiet</i>"
+        product.save(update_fields=["description"])
+        product.refresh_from_db()
+        self.assertEqual(product.search_document, "16GB RAM 1TB Quiet")
+
+    def test_backfill_fills_empty_documents(self):
+        product = self.product("Laptop", specification="<p>OLED</p>")
+        Product.objects.filter(pk=product.pk).update(search_document="")
+        generation = current_generation()
+
+        call_command("backfill_search_documents", stdout=StringIO())
+
+        product.refresh_from_db()
+        self.assertEqual(product.search_document, "OLED")
+        self.assertEqual(current_generation(), generation + 1)
+
+    def test_search_reads_the_document(self):
+        product = self.product("Laptop", specification="<p>Thunderbolt&nbsp;ports</p>")
+        index = SearchIndex(scorer=BM25())
+        index.rebuild()
+        self.assertEqual(index.search("thunderbolt"), [product.pk])
+
+
+class ResultCacheTests(SimpleTestCase):
+    def cached_page(self, category_id):
+        result_cache = ResultCache()
+        key = result_cache.key("laptop", category_id)
+        result_cache.set(key, result_cache.versions(category_id), [3, 1, 2])
+        self.assertEqual(result_cache.get(key, result_cache.versions(category_id)), ((3, 1, 2), None, None))
+        return result_cache, key
+
+    def test_generation_bump_misses_cached_pages(self):
+        result_cache, key = self.cached_page(None)
+        bump_generation()
+        self.assertIsNone(result_cache.get(key, result_cache.versions(None)))
+
+    def test_invalidating_a_category_misses_its_pages_and_unfiltered_ones(self):
+        filtered, filtered_key = self.cached_page(7)
+        unfiltered, unfiltered_key = self.cached_page(None)
+        other, other_key = self.cached_page(8)
+
+        results.invalidate(7)
+
+        self.assertIsNone(filtered.get(filtered_key, filtered.versions(7)))
+        self.assertIsNone(unfiltered.get(unfiltered_key, unfiltered.versions(None)))
+        self.assertIsNotNone(other.get(other_key, other.versions(8)))
+
+
+class PaginateRankedTests(SimpleTestCase):
+    scores = {1: 0.5, 2: 2.0, 3: 1.0, 4: 1.0, 5: 3.0}
+
+    def test_pages_follow_the_cursor(self):
+        first = paginate_ranked(self.scores, None, 2)
+        self.assertEqual(first.object_list, [5, 2])
+        second = paginate_ranked(self.scores, first.next_cursor, 2)
+        self.assertEqual(second.object_list, [4, 3])
+        third = paginate_ranked(self.scores, second.next_cursor, 2)
+        self.assertEqual(third.object_list, [1])
+        self.assertFalse(third.has_next)
+
+    def test_tampered_cursor_falls_back_to_the_first_page(self):
+        for values in (["x", 1], [1.0, "2"], [1.0, 2.5], [None, 1], [True, 1], [[1], 2], [1.0, 2, 3], [float("nan"), 1]):
+            with self.subTest(values=values):
+                page = paginate_ranked(self.scores, encode_cursor(*values), 2)
+                self.assertEqual(page.object_list, [5, 2])
+                self.assertTrue(page.is_first)
+
+        page = paginate_ranked(self.scores, "not-a-cursor", 2)
+        self.assertEqual(page.object_list, [5, 2])
+
+
+class RenderCardsTests(CatalogDataMixin, TestCase):
+    def setUp(self):
+        cards.card_cache().clear()
+        self.products = [self.product("Laptop"), self.product("Tablet")]
+
+    def rendered(self):
+        with mock.patch.object(cards, "render_to_string", wraps=cards.render_to_string) as render:
+            html = [html for _, html in cards.render_cards(Product.objects.for_cards().order_by("pk"))]
+        return render.call_count, html
+
+    def test_cards_are_rendered_once(self):
+        count, html = self.rendered()
+        self.assertEqual(count, 2)
+        self.assertIn("Laptop", html[0])
+        self.assertEqual(self.rendered(), (0, html))
+
+    def test_edits_and_category_changes_rerender(self):
+        self.rendered()
+        laptop = self.products[0]
+        laptop.name = "Notebook"
+        laptop.save()
+        count, html = self.rendered()
+        self.assertEqual(count, 1)
+        self.assertIn("Notebook", html[0])
+
+        categories.bump_version()
+        self.assertEqual(self.rendered()[0], 2)
+
+    def test_timeout_follows_the_product_age(self):
+        product = self.products[0]
+        self.assertEqual(cards.card_timeout(product), 60)
+        product.created_at = now() - timedelta(days=3)
+        self.assertEqual(cards.card_timeout(product), 60 * 60)
+        product.created_at = now() - timedelta(days=30)
+        self.assertEqual(cards.card_timeout(product), 24 * 60 * 60)
+
+
+class RefreshPrimaryImagesTests(CatalogDataMixin, TestCase):
+    def test_primary_images_are_copied_onto_the_products(self):
+        laptop, phone, bare = self.product("Laptop"), self.product("Phone"), self.product("Bare")
+        ProductImage.objects.create(product=laptop, image="products/laptop-side.jpg")
+        ProductImage.objects.create(product=laptop, image="products/laptop.jpg", is_default=True)
+        ProductImage.objects.create(
+            product=phone, image="products/phone.jpg",
+            renditions={"source": "products/phone.jpg", "width": 800, "height": 600, "sizes": {}},
+        )
+        Product.objects.update(primary_image="", primary_image_renditions={}, primary_image_width=None)
+
+        self.assertEqual(Product.objects.refresh_primary_images(), 2)
+        self.assertEqual(
+            list(Product.objects.order_by("pk").values_list("primary_image", "primary_image_width")),
+            [("products/laptop.jpg", None), ("products/phone.jpg", 800), ("", None)],
+        )
+        self.assertEqual(Product.objects.refresh_primary_images(), 0)
+        self.assertEqual(Product.objects.get(pk=bare.pk).updated_at, bare.updated_at)
+
+
+class ProductDetailConditionalGetTests(CatalogDataMixin, TestCase):
+    def setUp(self):
+        buffer = mock.patch.object(views, "view_buffer", ProductViewBuffer())
+        self.view_buffer = buffer.start()
+        self.addCleanup(buffer.stop)
+        self.addCleanup(self.view_buffer.flush)
+        self.product = self.product("Laptop")
+        self.url = reverse("catalog:product_detail", args=[self.laptops.slug, self.product.pk])
+        self.client.force_login(User.objects.create_user("customer"))
+
+    def test_viewed_unchanged_product_answers_304(self):
+        etag = self.client.get(self.url)["ETag"]
+        with mock.patch.object(views.quota.product_views, "consume") as consume:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        consume.assert_not_called()
+
+    def test_product_edits_change_the_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.product.name = "Notebook"
+        self.product.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class MockS3Mixin:
+    """Runs each test against a moto bucket named like the configured one."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock_aws()
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.storage = ProductImage._meta.get_field("image").storage
+        # boto3 resources are cached per thread; make them again under the mock
+        self.storage._connections.connection = None
+        self.storage._bucket = None
+        self.s3 = boto3.client("s3", region_name=self.storage.region_name or "us-east-1")
+        self.s3.create_bucket(Bucket=self.storage.bucket_name)
+
+    def stored_keys(self):
+        return sorted(item["Key"] for item in self.s3.list_objects_v2(Bucket=self.storage.bucket_name).get("Contents", []))
+
+
+class UploadProductImagesTests(MockS3Mixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("seller", "seller@example.com", "password")
+        self.product = Product.objects.create(
+            name="Laptop", brand="Dell", category=Category.objects.create(name="Laptops"),
+            specification="16GB", description="fast", created_by=self.user,
+        )
+
+    @staticmethod
+    def image(name, content):
+        return SimpleUploadedFile(name, content, content_type="image/jpeg")
+
+    def test_uploads_new_content_in_parallel(self):
+        client = self.storage.connection.meta.client
+        upload_fileobj = client.upload_fileobj
+        # every upload waits until three are in flight at once
+        barrier = threading.Barrier(3, timeout=5)
+
+        def concurrent_upload(*args, **kwargs):
+            barrier.wait()
+            return upload_fileobj(*args, **kwargs)
+
+        files = [self.image(f"photo{i}.jpg", f"content {i}".encode()) for i in range(3)]
+        files.append(self.image("copy.jpg", b"content 0"))
+        with mock.patch.object(client, "upload_fileobj", concurrent_upload):
+            images, failed = upload_product_images(self.product, files, max_workers=3)
+
+        self.assertEqual(failed, [])
+        self.assertEqual(len(images), 4)
+        self.assertEqual(ProductImage.objects.filter(product=self.product).count(), 4)
+        blobs = ImageBlob.objects.all()
+        self.assertEqual(len(blobs), 3)
+        self.assertEqual(self.stored_keys(), sorted(blob.name for blob in blobs))
+        self.assertEqual(ImageBlob.objects.get(name=images[0].image.name).ref_count, 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.primary_image, images[0].image.name)
+
+    def test_failed_upload_is_reported_and_leaves_no_row(self):
+        client = self.storage.connection.meta.client
+        upload_fileobj = client.upload_fileobj
+
+        def flaky_upload(fileobj, bucket, key, **kwargs):
+            if key.endswith(".png"):
+                raise ConnectionError("connection reset")
+            return upload_fileobj(fileobj, bucket, key, **kwargs)
+
+        files = [self.image("good.jpg", b"good"), self.image("bad.png", b"bad")]
+        with mock.patch.object(client, "upload_fileobj", flaky_upload), self.assertLogs("catalog.uploads", "ERROR"):
+            images, failed = upload_product_images(self.product, files)
+
+        self.assertEqual(failed, ["bad.png"])
+        self.assertEqual([image.image.name for image in images], [ImageBlob.objects.get().name])
+        self.assertEqual(ProductImage.objects.filter(product=self.product).count(), 1)
+        self.assertEqual(len(self.stored_keys()), 1)
+
+    def test_reuploaded_content_survives_the_previous_blobs_deletion(self):
+        (image,), _ = upload_product_images(self.product, [self.image("photo.jpg", b"photo")])
+        image.delete()  # last reference: the object is queued for deletion
+        self.assertEqual(list(StorageDeletion.objects.values_list("name", flat=True)), [image.image.name])
+
+        (again,), _ = upload_product_images(self.product, [self.image("photo.jpg", b"photo")])
+        self.assertNotEqual(again.image.name, image.image.name)
+        deletions.drain(storage=self.storage)
+        self.assertEqual(self.stored_keys(), [again.image.name])
+
+
+@override_settings(DIRECT_UPLOAD_MAX_SIZE=1024, DIRECT_UPLOAD_MAX_PENDING=3)
+class DirectUploadTests(MockS3Mixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("seller", "seller@example.com", "password")
+        self.other = User.objects.create_user("other", "other@example.com", "password")
+
+    def put(self, upload, content_type="image/jpeg"):
+        self.s3.put_object(Bucket=self.storage.bucket_name, Key=upload.key, Body=b"image", ContentType=content_type)
+
+    def test_presign_returns_a_post_limited_to_the_type_and_size(self):
+        upload, post = presign(self.user, PendingUpload.PRODUCT_IMAGE, "../My Photo.JPG", "image/jpeg", 512)
+
+        self.assertTrue(upload.key.startswith(f"products/uploads/{self.user.pk}/My_Photo_"))
+        self.assertTrue(upload.key.endswith(".jpg"))
+        self.assertEqual(post["fields"]["key"], upload.key)
+        self.assertEqual(post["fields"]["Content-Type"], "image/jpeg")
+        policy = json.loads(base64.b64decode(post["fields"]["policy"]))
+        self.assertIn({"Content-Type": "image/jpeg"}, policy["conditions"])
+        self.assertIn(["content-length-range", 1, 1024], policy["conditions"])
+
+    def test_presign_rejects_bad_requests(self):
+        cases = [
+            ("avatar", "a.jpg", "image/jpeg", 10),
+            (PendingUpload.PRODUCT_IMAGE, "a.html", "text/html", 10),
+            (PendingUpload.PRODUCT_IMAGE, "a.svg", "image/svg+xml", 10),
+            (PendingUpload.PRODUCT_IMAGE, "a.jpg", "image/jpeg", 2048),
+            (PendingUpload.PRODUCT_IMAGE, "a.jpg", "image/jpeg", 0),
+        ]
+        for purpose, name, content_type, size in cases:
+            with self.subTest(purpose=purpose, content_type=content_type, size=size):
+                with self.assertRaises(UploadError):
+                    presign(self.user, purpose, name, content_type, size)
+        self.assertFalse(PendingUpload.objects.exists())
+
+        for _ in range(3):
+            presign(self.user, PendingUpload.PRODUCT_IMAGE, "a.jpg", "image/jpeg")
+        with self.assertRaises(UploadError):
+            presign(self.user, PendingUpload.PRODUCT_IMAGE, "a.jpg", "image/jpeg")
+
+    def test_claim_only_accepts_the_users_own_uploaded_objects(self):
+        uploaded, _ = presign(self.user, PendingUpload.PRODUCT_IMAGE, "mine.jpg", "image/jpeg")
+        self.put(uploaded)
+        never_uploaded, _ = presign(self.user, PendingUpload.PRODUCT_IMAGE, "missing.jpg", "image/jpeg")
+        not_an_image, _ = presign(self.user, PendingUpload.PRODUCT_IMAGE, "page.jpg", "image/jpeg")
+        self.put(not_an_image, content_type="text/html")
+        someone_elses, _ = presign(self.other, PendingUpload.PRODUCT_IMAGE, "theirs.jpg", "image/jpeg")
+        self.put(someone_elses)
+
+        claimed, failed = claim(
+            self.user,
+            PendingUpload.PRODUCT_IMAGE,
+            [uploaded.pk, never_uploaded.pk, not_an_image.pk, someone_elses.pk],
+        )
+
+        self.assertEqual(claimed, [uploaded])
+        self.assertEqual(sorted(failed), ["expired upload", "missing.jpg", "page.jpg"])
+        self.assertEqual(claim(self.user, PendingUpload.PROFILE_PICTURE, [uploaded.pk]), ([], ["expired upload"]))
+        self.assertEqual(claim(self.user, PendingUpload.PRODUCT_IMAGE, ["x"]), ([], ["unknown upload"]))
+
+    def test_purge_removes_expired_uploads_and_their_objects(self):
+        expired, _ = presign(self.user, PendingUpload.PRODUCT_IMAGE, "old.jpg", "image/jpeg")
+        self.put(expired)
+        PendingUpload.objects.filter(pk=expired.pk).update(expires_at=now() - timedelta(seconds=1))
+        current, _ = presign(self.user, PendingUpload.PRODUCT_IMAGE, "new.jpg", "image/jpeg")
+        self.put(current)
+
+        out = StringIO()
+        call_command("purge_pending_uploads", stdout=out)
+        self.assertIn("Removed 1 orphaned upload(s).", out.getvalue())
+        self.assertEqual(list(PendingUpload.objects.all()), [current])
+        # the objects go through the deletion outbox
+        self.assertEqual(list(StorageDeletion.objects.values_list("name", flat=True)), [expired.key])
+        self.assertEqual(deletions.drain(storage=self.storage), (1, 0))
+        self.assertEqual(self.stored_keys(), [current.key])
+        self.assertFalse(StorageDeletion.objects.exists())
+
+
+class DrainStorageDeletionsTests(MockS3Mixin, TestCase):
+    def queue(self, *names):
+        for name in names:
+            self.s3.put_object(Bucket=self.storage.bucket_name, Key=name, Body=b"image")
+        StorageDeletion.enqueue(*names)
+
+    def test_drain_deletes_every_queued_object_in_batches(self):
+        self.queue("products/a.jpg", "products/b.jpg", "products/c.jpg")
+        StorageDeletion.enqueue("products/already-gone.jpg")
+
+        client = self.storage.connection.meta.client
+        with mock.patch.object(client, "delete_objects", wraps=client.delete_objects) as delete:
+            self.assertEqual(deletions.drain(batch_size=2, storage=self.storage), (4, 0))
+        self.assertEqual(delete.call_count, 2)
+        self.assertEqual(self.stored_keys(), [])
+        self.assertFalse(StorageDeletion.objects.exists())
+
+    def test_failures_are_retried_with_a_backoff(self):
+        self.queue("products/a.jpg", "products/b.jpg")
+        client = self.storage.connection.meta.client
+        errors = {"Errors": [{"Key": "products/a.jpg", "Code": "AccessDenied", "Message": "Access Denied"}]}
+        with mock.patch.object(client, "delete_objects", return_value=errors):
+            self.assertEqual(deletions.drain(storage=self.storage), (1, 1))
+        row = StorageDeletion.objects.get()
+        self.assertEqual((row.name, row.attempts, row.last_error), ("products/a.jpg", 1, "AccessDenied: Access Denied"))
+        self.assertGreater(row.available_at, now() + timedelta(seconds=50))
+
+        with mock.patch.object(client, "delete_objects", side_effect=RuntimeError("S3 is down")):
+            self.assertEqual(deletions.drain(storage=self.storage), (0, 0))  # not due yet
+            StorageDeletion.objects.update(available_at=now())
+            with self.assertLogs("catalog.deletions", "ERROR"):
+                self.assertEqual(deletions.drain(storage=self.storage), (0, 1))
+        row.refresh_from_db()
+        self.assertEqual((row.attempts, row.last_error), (2, "S3 is down"))
+        self.assertGreater(row.available_at, now() + timedelta(seconds=110))
+
+    @override_settings(STORAGE_DELETION_MAX_ATTEMPTS=3)
+    def test_rows_out_of_attempts_are_kept_for_inspection(self):
+        self.queue("products/a.jpg")
+        StorageDeletion.objects.update(attempts=3)
+        self.assertEqual(deletions.drain(storage=self.storage), (0, 0))
+        self.assertEqual(self.stored_keys(), ["products/a.jpg"])
+        self.assertTrue(StorageDeletion.objects.exists())
+
+
+class ImportProductsTests(TestCase):
+    def setUp(self):
+        importer._maps.clear()
+        self.addCleanup(importer._maps.clear)
+        self.user = User.objects.create_user("seller", "seller@example.com", "password")
+        self.category = Category.objects.create(name="Laptops")
+        self.existing = Product.objects.create(
+            name="Old Laptop", brand="Dell", category=self.category,
+            specification="8GB", description="old", created_by=self.user,
+        )
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.source = os.path.join(directory.name, "products.csv")
+
+    def write(self, rows):
+        with open(self.source, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["id", "name", "brand", "category", "seller"])
+            for pk, name in rows:
+                writer.writerow([pk, name, "Acme", "laptops", "seller"])
+
+    def test_rows_with_and_without_ids_never_overwrite_each_other(self):
+        next_id = self.existing.pk + 1
+        # the id-less rows come first, where the database would hand out next_id
+        self.write([
+            ("", "Fresh One"),
+            ("", "Fresh Two"),
+            (next_id, "Named"),
+            (self.existing.pk, "Renamed Laptop"),
+        ])
+        for batch_size in ("1", "1000"):
+            with self.subTest(batch_size=batch_size):
+                call_command("import_products", self.source, "--batch-size", batch_size, stdout=StringIO())
+
+                self.assertEqual(Product.objects.get(pk=next_id).name, "Named")
+                self.assertEqual(Product.objects.get(pk=self.existing.pk).name, "Renamed Laptop")
+                self.assertEqual(
+                    sorted(Product.objects.values_list("name", flat=True)),
+                    ["Fresh One", "Fresh Two", "Named", "Renamed Laptop"],
+                )
+                self.assertTrue(all(pk > next_id for pk in Product.objects.filter(name__startswith="Fresh").values_list("pk", flat=True)))
+                self.assertFalse(os.path.exists(f"{self.source}.checkpoint"))
+
+
+    def test_rows_without_ids_only_match_the_same_sellers_slug(self):
+        other = User.objects.create_user("other", "other@example.com", "password")
+        theirs = Product.objects.create(name="Gadget", brand="Acme", category=self.category, created_by=other)
+        row = {"name": "Gadget", "brand": "Acme", "category": "laptops", "seller": "seller"}
+
+        self.assertEqual(importer.import_batch([row]), (1, 0, []))
+        mine = Product.objects.get(created_by=self.user, name="Gadget")
+        self.assertEqual(mine.slug, "gadget-1")
+        self.assertEqual(Product.objects.get(pk=theirs.pk).created_by, other)
+
+        self.assertEqual(importer.import_batch([{**row, "slug": "gadget-1", "brand": "Zeta"}]), (0, 1, []))
+        self.assertEqual(Product.objects.get(pk=mine.pk).brand, "Zeta")
+
+    def test_batch_is_retried_when_a_parallel_batch_took_its_slug(self):
+        other = User.objects.create_user("other", "other@example.com", "password")
+        Product.objects.create(name="Gadget", brand="Acme", category=self.category, created_by=other)
+        row = {"name": "Gadget", "brand": "Acme", "category": "laptops", "seller": "seller"}
+
+        # the first lookup misses the product, as if its batch had not committed yet
+        with mock.patch.object(importer, "slug_owners", side_effect=[{}, importer.slug_owners({"gadget"})]):
+            self.assertEqual(importer.import_batch([row]), (1, 0, []))
+        slugs = Product.objects.filter(name="Gadget").values_list("slug", flat=True)
+        self.assertEqual(sorted(slugs), ["gadget", "gadget-1"])
+
+class ExportProductsTests(TestCase):
+    def test_exports_every_product_in_keyset_batches(self):
+        user = User.objects.create_user("seller", "seller@example.com", "password")
+        category = Category.objects.create(name="Laptops")
+        products = [
+            Product.objects.create(
+                name=f"Laptop {i}", brand="Dell", category=category,
+                specification="16GB", description="fast", created_by=user,
+            )
+            for i in range(5)
+        ]
+
+        # three batches of at most two rows, and the empty one that ends the loop
+        with self.assertNumQueries(4):
+            data = b"".join(exporter.export_chunks(exporter.export_queryset(), "csv", compress=True, chunk_size=2))
+
+        exported = list(csv.DictReader(gzip.decompress(data).decode().splitlines()))
+        self.assertEqual([row["id"] for row in exported], [str(product.pk) for product in products])
+        self.assertEqual(exported[0]["category"], "laptops")
+        self.assertEqual(exported[0]["seller"], "seller")
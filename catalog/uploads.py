@@ -0,0 +1,89 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+
+from utils import renditions
+
+from .blobs import blob_name, digest, shared_renditions
+from .models import ImageBlob, Product, ProductImage, StorageDeletion
+
+logger = logging.getLogger(__name__)
+
+
+def upload_product_images(product, files, max_workers=None):
+    """
+    Stores ``files`` for ``product`` and records them with one
+    ``bulk_create``. Returns ``(images, failed_file_names)``.
+
+    Files are hashed first and only content that is not stored yet is
+    uploaded, under a fresh name starting with its SHA-256; a repeated photo just
+    adds a reference to the existing ImageBlob and reuses its renditions.
+    The uploads share one boto3 client (clients are thread-safe, unlike the
+    per-thread resources S3Boto3Storage keeps) on a pool of at most
+    ``PRODUCT_IMAGE_UPLOAD_WORKERS`` threads. Rows are only created for files
+    that reached S3, and if writing the rows fails the new objects are queued
+    for deletion again, so neither side is left with orphans.
+    """
+    if not files:
+        return [], []
+
+    storage = ProductImage._meta.get_field("image").storage
+    client = storage.connection.meta.client
+    bucket = storage.bucket_name
+
+    digests = [(image_file, *digest(image_file)) for image_file in files]
+    stored = set(ImageBlob.objects.filter(sha256__in={sha256 for _, sha256, _ in digests}).values_list("sha256", flat=True))
+    new, names = {}, {}
+    for image_file, sha256, _ in digests:
+        names.setdefault(sha256, blob_name(sha256, image_file.name))
+        if sha256 not in stored:
+            new.setdefault(sha256, image_file)
+
+    def upload(image_file, name):
+        key = storage._normalize_name(name)
+        params = storage._get_write_parameters(key, image_file)
+        image_file.seek(0)
+        client.upload_fileobj(image_file, bucket, key, ExtraArgs=params, Config=storage.transfer_config)
+
+    uploaded, failed = [], []
+    if new:
+        workers = min(max_workers or getattr(settings, "PRODUCT_IMAGE_UPLOAD_WORKERS", 4), len(new))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="product-images") as pool:
+            futures = [
+                (sha256, pool.submit(upload, image_file, names[sha256]))
+                for sha256, image_file in new.items()
+            ]
+            for sha256, future in futures:
+                try:
+                    future.result()
+                    uploaded.append(names[sha256])
+                except Exception:
+                    logger.exception("Uploading %s for product %s failed", new[sha256].name, product.pk)
+                    new[sha256] = None
+
+    try:
+        with transaction.atomic():
+            images = []
+            for image_file, sha256, size in digests:
+                if sha256 in new and new[sha256] is None:
+                    failed.append(image_file.name)
+                    continue
+                blob, created = ImageBlob.reference(sha256, size, names[sha256])
+                if created and blob.name not in uploaded:
+                    # the blob was released since it was looked up
+                    upload(image_file, blob.name)
+                    uploaded.append(blob.name)
+                images.append(ProductImage(product=product, image=blob.name, blob=blob))
+            shared = shared_renditions([image.image.name for image in images])
+            for image in images:
+                image.renditions = shared.get(image.image.name, {})
+            images = ProductImage.objects.bulk_create(images)
+            Product.objects.filter(pk=product.pk).refresh_primary_images()
+            # bulk_create sends no post_save, so queue the renditions here
+            renditions.schedule(ProductImage, [image.image.name for image in images if not image.renditions])
+    except Exception:
+        StorageDeletion.enqueue(*uploaded)
+        raise
+    return images, failed
@@ -1,14 +1,27 @@
-from django.views.generic import CreateView, ListView, DetailView, View
+import functools
+
+from django.views.generic import CreateView, ListView, DetailView
 from django.shortcuts import redirect, get_object_or_404
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.urls import reverse_lazy
-from .models import Category, Product, ProductImage
+from django.urls import reverse, reverse_lazy
+from django.utils.http import urlencode
+from .models import PendingUpload, Product
 from .forms import ProductForm
-from django.db.models import Q
+from . import categories, facets
+from .cards import render_cards
+from .categories import all_categories
+from .uploads import upload_product_images
+from .direct_uploads import UploadError, attach_product_images, claim, presign
+from .pagination import KeysetPage, paginate_by_pk, paginate_ranked
+from .search import current_generation, result_cache, search_index
+from django.conf import settings
+from django.db.models import Count, Max
+from utils.http import make_etag, not_modified, set_validators
+from utils.page_cache import cached_page, page_key
 from django.contrib import messages
-from django.utils.timezone import now, timedelta
 from django.http import JsonResponse
-from customer.models import ProductView  # Import the new model
+from customer import quota
+from customer.tracking import view_buffer
 from django.contrib.auth.decorators import login_required
 
 
@@ -34,12 +47,10 @@ class ProductCreateView(LoginRequiredMixin, CreateView):
     def form_valid(self, form):
         # print('form', form.data)
         user = self.request.user
-        time_threshold = now() - timedelta(hours=24)
-        recent_product_count = Product.objects.filter(created_by=user, created_at__gte=time_threshold).count()
         max_products = self.get_max_products(user)
 
-        # Check if the user has exceeded their limit
-        if recent_product_count >= max_products:
+        # Reserve a slot in the user's 24-hour window (given back if saving fails)
+        if not quota.product_creation.consume(user.pk, max_products):
             messages.error(
                 self.request, 
                 f"You have reached your daily limit of {max_products} products. "
@@ -51,12 +62,20 @@ class ProductCreateView(LoginRequiredMixin, CreateView):
         product = form.save(commit=False)
         product.created_by = user
         product.is_active = False
-        product.save()
+        try:
+            product.save()
+        except Exception:
+            quota.product_creation.release(user.pk)
+            raise
         
-        # Handling multiple images
-        images = self.request.FILES.getlist("images")
-        for image in images:
-            ProductImage.objects.create(product=product, image=image)
+        # Images the browser already put in S3 are only checked and recorded;
+        # files posted with the form (no-JS fallback) are uploaded in parallel
+        uploads, failed = claim(user, PendingUpload.PRODUCT_IMAGE, self.request.POST.getlist("uploads"))
+        attach_product_images(product, uploads)
+        images, upload_failed = upload_product_images(product, self.request.FILES.getlist("images"))
+        failed += upload_failed
+        if failed:
+            messages.warning(self.request, "Some images could not be uploaded: " + ", ".join(failed))
 
         messages.success(self.request, "Product added successfully!")
         return redirect(self.success_url)
@@ -66,32 +85,90 @@ class ProductListView(LoginRequiredMixin, ListView):
     model = Product
     template_name = "default/catalog/product_list.html"
     context_object_name = "products"
+    page_size = 24
+
+    def get(self, request, *args, **kwargs):
+        # The listing is the same for every user; only the menus and messages are rendered per request
+        key = page_key(
+            request, facets.current_version(), categories.current_version(), current_generation()
+        )
+        return cached_page(request, key, lambda: super(ProductListView, self).get(request, *args, **kwargs))
 
     def get_queryset(self):
-        queryset = Product.objects.filter(is_active=True)
+        queryset = Product.objects.filter(is_active=True).for_cards()
         query = self.request.GET.get("q")
         category_slug = self.request.GET.get("category")
+        brand = self.request.GET.get("brand", "").strip()
+        cursor = self.request.GET.get("after")
+
+        self.categories = all_categories()
+        self.selected = next((c for c in self.categories if c.slug == category_slug), None)
+        category_id = self.selected.pk if self.selected else None
 
         if query:
-            queryset = queryset.filter(
-                Q(name__icontains=query) |
-                Q(brand__icontains=query) |
-                Q(specification__icontains=query) |
-                Q(description__icontains=query) |
-                Q(category__name__icontains=query)
-            )
+            # Ranked from the in-memory index (or a cached page of ids), then
+            # one page hydrated by primary key
+            scores = functools.cache(lambda: search_index.scores(query))
+            self.facet_pairs = facets.search_pairs(query, scores, search_index)
+            if category_slug and self.selected is None:
+                self.page = KeysetPage([])
+            else:
+                key = result_cache.key(query, category_id, brand, cursor)
+                versions = result_cache.versions(category_id)
+                cached = result_cache.get(key, versions)
+                if cached is None:
+                    self.page = paginate_ranked(search_index.restrict(scores(), category_id, brand), cursor, self.page_size)
+                    result_cache.set(key, versions, self.page.object_list, self.page.cursor, self.page.next_cursor)
+                else:
+                    ids, page_cursor, next_cursor = cached
+                    self.page = KeysetPage(list(ids), page_cursor, next_cursor)
+                products = queryset.in_bulk(self.page.object_list)
+                self.page.object_list = [products[pk] for pk in self.page.object_list if pk in products]
+        else:
+            self.facet_pairs = facets.catalog_pairs()
+            if category_slug:
+                queryset = queryset.filter(category__slug=category_slug)
+            if brand:
+                queryset = queryset.filter(brand__iexact=brand)
+            self.page = paginate_by_pk(queryset, cursor, self.page_size)
 
-        if category_slug:
-            queryset = queryset.filter(category__slug=category_slug)
+        return self.page.object_list
 
-        return queryset
+    def get_facets(self):
+        """Facet entries with ready-made query strings that keep the other filters."""
+        brand = self.request.GET.get("brand", "").strip()
+        result = facets.build_facets(self.facet_pairs, self.categories, self.selected and self.selected.pk, brand)
+        params = self.request.GET.copy()
+        params.pop("after", None)
+        for entry in result["categories"]:
+            entry_params = params.copy()
+            entry_params["category"] = entry["category"].slug
+            entry["params"] = entry_params.urlencode()
+        for entry in result["brands"]:
+            entry_params = params.copy()
+            if entry["selected"]:
+                entry_params.pop("brand", None)
+            else:
+                entry_params["brand"] = entry["value"]
+            entry["params"] = entry_params.urlencode()
+        return result
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["categories"] = Category.objects.all()
+        context["categories"] = self.categories
+        context["cards"] = render_cards(self.page.object_list)
+        context["facets"] = self.get_facets()
         context["query"] = self.request.GET.get("q", "")
         context["category"] = self.request.GET.get("category", "")
         context["selected_category"] = self.request.GET.get("category", "")
+        context["brand"] = self.request.GET.get("brand", "")
+        context["page"] = self.page
+        params = self.request.GET.copy()
+        params.pop("after", None)
+        context["first_page_params"] = params.urlencode()
+        if self.page.has_next:
+            params["after"] = self.page.next_cursor
+            context["next_page_params"] = params.urlencode()
         return context
 
 
@@ -101,7 +178,7 @@ class ProductDetailView(LoginRequiredMixin, DetailView):
     context_object_name = "product"
 
     def get_queryset(self):
-        return Product.objects.filter(is_active=True)
+        return Product.objects.filter(is_active=True).select_related("category", "created_by__profile")
 
     def get_max_views(self, user):
         """Returns the max number of product views allowed per day based on the user's plan."""
@@ -112,43 +189,66 @@ class ProductDetailView(LoginRequiredMixin, DetailView):
             return float('inf') if max_views == 0 else max_views  # If max_views = 0, allow unlimited
         return 5  # Default limit for free users
 
+    def get_validators(self):
+        """
+        ETag and Last-Modified for the page from one aggregate row: the
+        product, its images and the seller's profile. None if the product is
+        not (or no longer) active.
+        """
+        state = (
+            Product.objects.filter(pk=self.kwargs["pk"], is_active=True)
+            .values("updated_at", "created_by__profile__updated_at")
+            .annotate(images=Count("product_images"), images_updated=Max("product_images__updated_at"))
+            .order_by("pk")
+            .first()
+        )
+        if state is None:
+            return None
+        changes = [state["updated_at"], state["created_by__profile__updated_at"], state["images_updated"]]
+        last_modified = max(change for change in changes if change)
+        etag = make_etag(self.request.user.pk, categories.current_version(), state["images"], *changes)
+        return etag, last_modified
+
     def get(self, request, *args, **kwargs):
-        product = self.get_object()
         user = request.user
-        time_threshold = now() - timedelta(hours=24)
-        # Check if the user has already viewed this product
-        existing_view = ProductView.objects.filter(user=user, product=product).first()
+        is_ajax = request.headers.get("X-Requested-With") == "XMLHttpRequest"
 
-        if not existing_view:
-            # Count total views within the last 24 hours
-            recent_views_count = ProductView.objects.filter(user=user, viewed_at__gte=time_threshold).count()
+        # A client can only hold a copy of a product page it was allowed to view
+        validators = None
+        if not is_ajax and view_buffer.has_viewed(user.pk, int(self.kwargs["pk"])):
+            validators = self.get_validators()
+            response = validators and not_modified(request, *validators)
+            if response is not None:
+                view_buffer.record(user.pk, int(self.kwargs["pk"]))
+                return response
+
+        self.object = product = self.get_object()
+        # Views are buffered and written in bulk; the quota is read from the same buffer
+        if not view_buffer.has_viewed(user.pk, product.pk):
             max_views = self.get_max_views(user)
 
             # If limit is reached, return error JSON if AJAX, otherwise show message
-            if recent_views_count >= max_views:
+            if not quota.product_views.consume(user.pk, None if max_views == float("inf") else max_views):
                 if request.headers.get("X-Requested-With") == "XMLHttpRequest":
                     return JsonResponse({"error": f"You have reached your daily limit of {max_views} product views."}, status=403)
                 messages.error(request, f"You have reached your daily limit of {max_views} product views.")
                 return self.render_to_response(self.get_context_data())  # Render the same page
 
-        # Store or update the product view in the database
-        ProductView.objects.update_or_create(
-            user=user, product=product,
-            defaults={"viewed_at": now()}  # Always update the timestamp
-        )
+        # Store or update the product view (flushed to the database in batches)
+        view_buffer.record(user.pk, product.pk)
 
         # Check if the request is an AJAX request
         if request.headers.get("X-Requested-With") == "XMLHttpRequest":
             return JsonResponse({"redirect_url": request.path})  # Return JSON response with redirect URL
 
-        return super().get(request, *args, **kwargs)
+        response = self.render_to_response(self.get_context_data(object=product))
+        validators = validators or self.get_validators()
+        return set_validators(response, *validators) if validators else response
 
     def get_context_data(self, **kwargs):
         """Pass viewed products (last 24 hours) to the template."""
         context = super().get_context_data(**kwargs)
-        time_threshold = now() - timedelta(hours=24)
-        viewed_products = Product.objects.filter(user_views__user=self.request.user, user_views__viewed_at__gte=time_threshold)
-        context["viewed_products"] = viewed_products
+        context["viewed_products"] = Product.objects.filter(pk__in=view_buffer.recent(self.request.user.pk))
         return context
 
 @login_required
@@ -161,3 +261,44 @@ def delete_product(request, product_id):
     
     return JsonResponse({"success": False, "error": "Invalid request method."}, status=400)
 
+
+
+@login_required
+def autocomplete(request):
+    """Search-box suggestions answered from the in-memory prefix index."""
+    query = request.GET.get("q", "").strip()
+    suggestions = search_index.suggest(query, limit=settings.SEARCH_SUGGESTIONS_LIMIT) if query else []
+
+    list_url = reverse("catalog:product_list")
+    for suggestion in suggestions:
+        if suggestion["type"] == "category":
+            suggestion["url"] = f"{list_url}?{urlencode({'category': suggestion['slug']})}"
+        else:
+            suggestion["url"] = f"{list_url}?{urlencode({'q': suggestion['label']})}"
+        del suggestion["slug"]
+
+    response = JsonResponse({"query": query, "suggestions": suggestions})
+    response["Cache-Control"] = "private, max-age=60"
+    return response
+
+
+@login_required
+def direct_upload(request):
+    """Presigned POST for uploading one image straight to S3."""
+    if request.method != "POST":
+        return JsonResponse({"success": False, "error": "Invalid request method."}, status=400)
+    try:
+        size = int(request.POST.get("size", ""))
+    except ValueError:
+        size = None
+    try:
+        upload, post = presign(
+            request.user,
+            request.POST.get("purpose", PendingUpload.PRODUCT_IMAGE),
+            request.POST.get("name", ""),
+            request.POST.get("content_type", ""),
+            size,
+        )
+    except UploadError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+    return JsonResponse({"success": True, "id": upload.pk, "url": post["url"], "fields": post["fields"]})
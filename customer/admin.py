@@ -7,6 +7,7 @@ from datetime import timedelta
 from django.utils.html import format_html
 from django.urls import path, reverse
 from .models import Subscription, UserProfile, SubscriptionPlan, PlanType, SubscriptionDuration, PaymentRecord, BusinessProfile
+from .backends import ACCOUNT_RELATED
 from django.conf import settings
 from django.contrib.auth.admin import UserAdmin as DefaultUserAdmin
 from django.utils.safestring import mark_safe
@@ -30,6 +31,7 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_display = ("user", "phone_number", "is_verified", "created_at")
     search_fields = ("user__username", "phone_number")
     list_filter = ("is_verified", "created_at")
+    list_select_related = ("user",)
 
 
 class CustomUserAdmin(DefaultUserAdmin):
@@ -42,6 +44,10 @@ class CustomUserAdmin(DefaultUserAdmin):
     search_fields = ("email", "username", "profile__phone_number")
     actions = ["approve_users", "download_filtered_user_data"]  # Add bulk actions
 
+    def get_queryset(self, request):
+        # user_category, the profile columns and the Excel export read these per row
+        return super().get_queryset(request).select_related(*ACCOUNT_RELATED)
+
     def user_category(self, obj):
         if hasattr(obj, "subscription"):
             if obj.subscription.plan.name == "Premium (Plan A)":
@@ -146,7 +152,7 @@ class CustomUserAdmin(DefaultUserAdmin):
         return response
 
     def change_view(self, request, object_id, form_url='', extra_context=None):
-        user = get_object_or_404(User, pk=object_id)
+        user = get_object_or_404(User.objects.select_related("profile"), pk=object_id)
         decrypted_password = None
         if hasattr(user, "profile") and user.profile and user.profile.encrypted_password:
             try:
@@ -171,6 +177,7 @@ class SubscriptionAdmin(admin.ModelAdmin):
         "end_date", "reject_button"
     )
     list_filter = ("plan", "is_approved")
+    list_select_related = ("user", "plan", "duration_days", "pending_plan", "pending_duration")
 
     def get_urls(self):
         urls = super().get_urls()
@@ -356,6 +363,7 @@ class SubscriptionPlanAdmin(admin.ModelAdmin):
     """Admin configuration for subscription plans (mapping plan type & duration)."""
     list_display = ("plan_type", "duration_days", "price")
     list_filter = ("plan_type", "duration_days")
+    list_select_related = ("plan_type", "duration_days")
     search_fields = ("plan_type__name",)
     ordering = ("plan_type", "duration_days")
 
@@ -370,6 +378,7 @@ import datetime
 class PaymentRecordAdmin(admin.ModelAdmin):
     list_display = ('user', 'subscription', 'paid_amount', 'payment_date', 'send_invoice_button')
     search_fields = ['user__username']
+    list_select_related = ("user", "subscription__user", "subscription__plan", "subscription__duration_days")
 
     def get_urls(self):
         urls = super().get_urls()
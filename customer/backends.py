@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+# Everything the layout, the plan limits and the dashboard read off request.user.
+ACCOUNT_RELATED = (
+    "profile",
+    "subscription__plan",
+    "subscription__duration_days",
+    "subscription__pending_plan",
+    "subscription__pending_duration",
+)
+
+
+def account_queryset():
+    """Users with their profile, subscription, active plan and pending plan joined in."""
+    return get_user_model()._default_manager.select_related(*ACCOUNT_RELATED)
+
+
+class AccountBackend(ModelBackend):
+    """
+    ModelBackend whose session lookup loads the whole account in one joined
+    query. AuthenticationMiddleware memoizes the result on the request, so
+    ``request.user.profile`` and ``request.user.subscription.plan`` never hit
+    the database again while the request is served.
+    """
+
+    def get_user(self, user_id):
+        try:
+            user = account_queryset().get(pk=user_id)
+        except get_user_model().DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
@@ -1,14 +1,18 @@
 from django.views.generic import TemplateView, ListView
 from django.contrib.auth.mixins import LoginRequiredMixin
+from catalog.cards import ROW_TEMPLATE, render_cards
 from catalog.models import Product
 from django.contrib.auth.views import PasswordChangeView
 from django.urls import reverse_lazy
 from django.contrib.messages.views import SuccessMessageMixin
 from django.contrib.auth import update_session_auth_hash
 from django.views import View
-from django.shortcuts import render, redirect, get_object_or_404
-from customer.models import ProductView, Subscription, SubscriptionPlan, PlanType, SubscriptionDuration
-from django.http import JsonResponse
+from django.shortcuts import render, redirect
+from customer.models import ProductView, Subscription, PlanType
+from customer.pricing import price_matrix
+from django.http import Http404, JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.utils.timezone import now
 from django.contrib import messages
 
@@ -28,7 +32,12 @@ class UserProductListView(LoginRequiredMixin, ListView):
     context_object_name = "products"
 
     def get_queryset(self):
-        return Product.objects.filter(created_by=self.request.user)
+        return Product.objects.filter(created_by=self.request.user).for_cards()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["cards"] = render_cards(context["products"], ROW_TEMPLATE)
+        return context
 
 class CustomPasswordChangeView(SuccessMessageMixin, PasswordChangeView):
     template_name = "default/customer/dashboard/change_password.html"  
@@ -85,42 +94,32 @@ class SubscriptionUpgradeView(LoginRequiredMixin, View):
         user = request.user
 
         # Ensure user has a subscription, if not assign Basic Plan
-        subscription, created = Subscription.objects.get_or_create(
-            user=user,
-            defaults={
-                "plan": PlanType.objects.get(id=1),  # Assign Basic Plan
-                "duration_days": None,
-                "amount_paid": 0,
-                "start_date": now(),
-                "end_date": None,  # Unlimited for Basic
-                "is_approved": True,
-            }
-        )
-
-        # Fetch all plan types except 'Basic' (ID=1)
-        # plans = PlanType.objects.exclude(id=1)
-        # premium_plans = plans.get(name="Premium (Plan A)")
-
-        plans = PlanType.objects.all()
+        subscription = getattr(user, "subscription", None)  # preloaded with the account
+        if subscription is None:
+            subscription, created = Subscription.objects.get_or_create(
+                user=user,
+                defaults={
+                    "plan": PlanType.objects.get(id=1),  # Assign Basic Plan
+                    "duration_days": None,
+                    "amount_paid": 0,
+                    "start_date": now(),
+                    "end_date": None,  # Unlimited for Basic
+                    "is_approved": True,
+                }
+            )
+
+        # Plans, durations and prices all come from the cached price matrix
+        matrix = price_matrix()
+        plans = matrix.plans
         premium_plans = plans
 
-        # Fetch all available subscription durations
-        durations = SubscriptionDuration.objects.all()
-
-        # Fetch subscription prices
-        plan_prices = {}
-        for plan in plans:
-            prices = {dur.duration_days: "-" for dur in durations}  # Default "-"
-            for sub_plan in SubscriptionPlan.objects.filter(plan_type=plan):
-                prices[sub_plan.duration_days.duration_days] = sub_plan.price
-            plan_prices[plan.name] = prices
-
         context = {
             "subscription": subscription,
             "plans": plans,
             "premium_plans": premium_plans,
-            "durations": durations,
-            "plan_prices": plan_prices,
+            "durations": matrix.durations,
+            "plan_prices": matrix.table(),
+            "price_matrix": matrix.as_json(),
         }
         return render(request, self.template_name, context)
 
@@ -134,13 +133,19 @@ class SubscriptionUpgradeView(LoginRequiredMixin, View):
             messages.error(request, "Invalid plan or duration selection.")
             return redirect("user:subscription_upgrade")  # Replace with your actual URL name
 
-        # Get selected plan and duration
-        plan = get_object_or_404(PlanType, id=plan_id)
-        duration = get_object_or_404(SubscriptionDuration, id=duration_id)
-
-        # Fetch price from SubscriptionPlan table
-        subscription_plan = SubscriptionPlan.objects.filter(plan_type=plan, duration_days=duration).first()
-        if not subscription_plan:
+        # Get selected plan, duration and price
+        matrix = price_matrix()
+        try:
+            plan_id, duration_id = int(plan_id), int(duration_id)
+        except ValueError:
+            raise Http404("Invalid plan or duration.")
+        plan = matrix.plan(plan_id)
+        duration = matrix.duration(duration_id)
+        if plan is None or duration is None:
+            raise Http404("Invalid plan or duration.")
+
+        price = matrix.price(plan_id, duration_id)
+        if price is None:
             messages.error(request, "Selected plan and duration not available.")
             return redirect("user:subscription_upgrade")  # Replace with your actual URL name
 
@@ -148,7 +153,7 @@ class SubscriptionUpgradeView(LoginRequiredMixin, View):
         subscription = Subscription.objects.get(user=user)
         subscription.pending_plan = plan  # Set pending plan
         subscription.pending_duration = duration
-        subscription.amount_paid = subscription_plan.price
+        subscription.amount_paid = price
         subscription.is_approved = False  # Await admin approval
         subscription.save()
 
@@ -156,7 +161,14 @@ class SubscriptionUpgradeView(LoginRequiredMixin, View):
         return redirect("user:subscription_upgrade")  # Replace with your actual URL name
 
 
+def price_matrix_etag(request):
+    return price_matrix().etag
+
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=price_matrix_etag)
 def get_plan_price(request):
+    """Answered from the in-memory price matrix; unchanged prices revalidate with a 304."""
     plan_id = request.GET.get("plan_id")
     duration_id = request.GET.get("duration_id")
 
@@ -164,20 +176,11 @@ def get_plan_price(request):
         return JsonResponse({"error": "Invalid selection"}, status=400)
 
     try:
-        # Ensure valid PlanType and SubscriptionDuration exist
-        plan = get_object_or_404(PlanType, id=plan_id)
-        duration = get_object_or_404(SubscriptionDuration, id=duration_id)
-
-        # Fetch price from SubscriptionPlan
-        subscription_plan = SubscriptionPlan.objects.filter(
-            plan_type=plan, duration_days=duration
-        ).first()
-
-        if subscription_plan:
-            return JsonResponse({"price": float(subscription_plan.price)})
-        else:
-            return JsonResponse({"price": "Not Available"})
-    except Exception as e:
-        return JsonResponse({"error": str(e)}, status=500)
-
+        price = price_matrix().price(int(plan_id), int(duration_id))
+    except ValueError:
+        return JsonResponse({"error": "Invalid selection"}, status=400)
 
+    if price is not None:
+        return JsonResponse({"price": float(price)})
+    else:
+        return JsonResponse({"price": "Not Available"})
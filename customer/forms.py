@@ -1,5 +1,6 @@
 from django import forms
 from .models import Subscription, PlanType, SubscriptionDuration, SubscriptionPlan, PaymentRecord
+from catalog.forms import CategoryMultipleChoiceField
 from catalog.models import Category
 
 class SubscriptionUpgradeForm(forms.ModelForm):
@@ -47,7 +48,7 @@ class RegistrationForm(forms.Form):
     latitude = forms.FloatField(required=False, widget=forms.HiddenInput(attrs={'id': 'latitude'}))
     longitude = forms.FloatField(required=False, widget=forms.HiddenInput(attrs={'id': 'longitude'}))
     business_type = forms.ChoiceField(choices=BUSINESS_TYPE_CHOICES, widget=forms.Select(attrs={'class': 'form-control'}))
-    dealing_with = forms.ModelMultipleChoiceField(
+    dealing_with = CategoryMultipleChoiceField(
     queryset=Category.objects.all(),
         widget=forms.SelectMultiple(attrs={'class': 'form-control select2'}),
         required=True
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:43
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_viewed_at(apps, schema_editor):
+    # The first view of existing rows is unknown; their last view is the best guess.
+    ProductView = apps.get_model("customer", "ProductView")
+    ProductView.objects.update(first_viewed_at=F("viewed_at"))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("customer", "0005_remove_businessprofile_dealing_with_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productview",
+            name="first_viewed_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(copy_viewed_at, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,8 @@
 import logging
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from storages.backends.s3boto3 import S3Boto3Storage
-from catalog.models import Product, Category
+from catalog.models import Product, Category, StorageDeletion
 from django.utils.timezone import now
 from datetime import timedelta
 from utils.crypto import encrypt_password, decrypt_password
@@ -27,14 +27,11 @@ class UserProfile(models.Model):
         return decrypt_password(self.encrypted_password)
 
     def delete(self, *args, **kwargs):
-        """Delete profile picture from S3 when the UserProfile is deleted"""
-        if self.profile_picture:
-            try:
-                self.profile_picture.delete(save=False)
-            except Exception as e:
-                # Log the error but continue with deletion
-                logger.error(f"Failed to delete profile picture from S3: {str(e)}")
-        super().delete(*args, **kwargs)
+        """Queue the profile picture for deletion from S3 when the UserProfile is deleted"""
+        with transaction.atomic():
+            if self.profile_picture:
+                StorageDeletion.enqueue(self.profile_picture.name)
+            super().delete(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.username}'s Profile"
@@ -135,6 +132,7 @@ class ProductView(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="viewed_products")
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="user_views")
     viewed_at = models.DateTimeField(default=now)
+    first_viewed_at = models.DateTimeField(default=now)  # kept when repeat views move viewed_at
 
     class Meta:
         unique_together = ("user", "product")  # Prevent duplicate views per user per product
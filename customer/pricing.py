@@ -0,0 +1,92 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+
+from utils.cache import get_or_compute, shared_cache
+
+VERSION_KEY = "customer:pricing:version"
+
+_lock = threading.Lock()
+_local = {"version": None, "loaded_at": 0, "matrix": None}
+
+
+def bump_version():
+    """Invalidate every worker's price matrix (called from the plan/duration/price signals)."""
+    try:
+        shared_cache().incr(VERSION_KEY)
+    except ValueError:
+        shared_cache().set(VERSION_KEY, 2, None)
+
+
+class PriceMatrix:
+    """Every plan type, duration and plan/duration price, loaded together."""
+
+    def __init__(self, plans, durations, prices):
+        self.plans = plans
+        self.durations = durations
+        self.prices = prices  # (plan id, duration id) -> Decimal
+        self._plans = {plan.pk: plan for plan in plans}
+        self._durations = {duration.pk: duration for duration in durations}
+        digest = hashlib.md5()
+        for (plan_id, duration_id), price in sorted(prices.items()):
+            digest.update(f"{plan_id}:{duration_id}:{price};".encode())
+        self.etag = digest.hexdigest()
+
+    @classmethod
+    def load(cls):
+        from .models import PlanType, SubscriptionDuration, SubscriptionPlan
+
+        prices = {
+            (plan_id, duration_id): price
+            for plan_id, duration_id, price in SubscriptionPlan.objects.values_list("plan_type_id", "duration_days_id", "price")
+        }
+        return cls(list(PlanType.objects.all()), list(SubscriptionDuration.objects.all()), prices)
+
+    def plan(self, plan_id):
+        return self._plans.get(plan_id)
+
+    def duration(self, duration_id):
+        return self._durations.get(duration_id)
+
+    def price(self, plan_id, duration_id):
+        return self.prices.get((plan_id, duration_id))
+
+    def table(self):
+        """``{plan name: {duration days: price or "-"}}`` for the pricing table."""
+        return {
+            plan.name: {
+                duration.duration_days: self.prices.get((plan.pk, duration.pk), "-")
+                for duration in self.durations
+            }
+            for plan in self.plans
+        }
+
+    def as_json(self):
+        """``{plan id: {duration id: price}}`` for embedding with ``json_script``."""
+        data = {}
+        for (plan_id, duration_id), price in self.prices.items():
+            data.setdefault(str(plan_id), {})[str(duration_id)] = float(price)
+        return data
+
+
+def price_matrix():
+    """
+    The current ``PriceMatrix``. Each worker keeps it in memory and checks a
+    version counter in the shared cache; only the first worker to see a new
+    version reads the three plan tables. Both copies also expire after
+    ``PRICING_CACHE_TIMEOUT`` seconds, in case the cache lost the counter.
+    """
+    version = shared_cache().get_or_set(VERSION_KEY, 1, None)
+    timeout = getattr(settings, "PRICING_CACHE_TIMEOUT", 10 * 60)
+    with _lock:
+        if _local["version"] == version and time.monotonic() - _local["loaded_at"] < timeout:
+            return _local["matrix"]
+
+    matrix = get_or_compute(f"customer:pricing:{version}", PriceMatrix.load, timeout, name="pricing")
+    with _lock:
+        _local["version"] = version
+        _local["loaded_at"] = time.monotonic()
+        _local["matrix"] = matrix
+    return matrix
@@ -0,0 +1,114 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils.timezone import now
+
+from utils.cache import shared_cache
+
+
+class SlidingWindowQuota:
+    """
+    Per-user sliding-window counter for one action, kept in the shared cache
+    (``SHARED_CACHE``). Every worker must count into the same keys and
+    ``incr`` must be atomic, so production needs Redis or Memcached there; a
+    per-process cache would multiply the limit by the number of workers.
+
+    The window is split into ``buckets`` fixed slots; each slot is a cache key
+    that is ``incr``-ed atomically and expires with the window, so checking a
+    limit is a single ``get_many`` of a fixed number of keys however many
+    events the user produced. ``consume`` increments first and backs out if
+    the total went over the limit, so parallel requests can lose a slot to
+    each other but never oversubscribe it.
+
+    The first check for a user after the cache lost their counters (e.g. a
+    Redis restart) seeds the slots from ``source``, a callable returning the
+    timestamps of the user's events since a datetime.
+    """
+
+    def __init__(self, action, source, window=None, buckets=None):
+        self.action = action
+        self.source = source
+        self.window = window or getattr(settings, "QUOTA_WINDOW", 24 * 60 * 60)
+        self.buckets = buckets or getattr(settings, "QUOTA_BUCKETS", 24)
+        self.bucket_seconds = self.window / self.buckets
+
+    @property
+    def cache(self):
+        return shared_cache()
+
+    def _key(self, user_id, slot):
+        return f"quota:{self.action}:{user_id}:{slot}"
+
+    def _slots(self, at=None):
+        current = int((at or time.time()) // self.bucket_seconds)
+        return range(current - self.buckets + 1, current + 1)
+
+    def _seed(self, user_id):
+        """Load the user's window from the database unless it is already cached."""
+        seeded_key = f"quota:{self.action}:{user_id}:seeded"
+        cache = self.cache
+        if cache.get(seeded_key):
+            return
+        counts = {}
+        for timestamp in self.source(user_id, now() - timedelta(seconds=self.window)):
+            slot = int(timestamp.timestamp() // self.bucket_seconds)
+            counts[slot] = counts.get(slot, 0) + 1
+        timeout = int(self.window + self.bucket_seconds)
+        for slot, count in counts.items():
+            cache.add(self._key(user_id, slot), count, timeout)
+        cache.set(seeded_key, True, timeout)
+
+    def used(self, user_id):
+        self._seed(user_id)
+        keys = [self._key(user_id, slot) for slot in self._slots()]
+        return sum(self.cache.get_many(keys).values())
+
+    def consume(self, user_id, limit=None, amount=1):
+        """
+        Counts ``amount`` events and returns True, or returns False without
+        counting anything if that would take the user over ``limit``.
+        ``limit=None`` means unlimited (events are still counted).
+        """
+        self._seed(user_id)
+        cache = self.cache
+        key = self._key(user_id, self._slots()[-1])
+        cache.add(key, 0, int(self.window + self.bucket_seconds))
+        try:
+            cache.incr(key, amount)
+        except ValueError:  # evicted between add() and incr()
+            cache.set(key, amount, int(self.window + self.bucket_seconds))
+        if limit is not None and self.used(user_id) > limit:
+            self._decr(key, amount)
+            return False
+        return True
+
+    def release(self, user_id, amount=1):
+        """Give back events counted by ``consume`` that did not happen after all."""
+        self._decr(self._key(user_id, self._slots()[-1]), amount)
+
+    def _decr(self, key, amount):
+        try:
+            self.cache.decr(key, amount)
+        except ValueError:
+            pass
+
+
+def _product_views_since(user_id, since):
+    from .models import ProductView
+
+    # Only a user's first view of a product counts; repeat views move viewed_at but not first_viewed_at.
+    return (
+        ProductView.objects.filter(user_id=user_id, first_viewed_at__gte=since)
+        .values_list("first_viewed_at", flat=True)
+    )
+
+
+def _products_created_since(user_id, since):
+    from catalog.models import Product
+
+    return Product.objects.filter(created_by_id=user_id, created_at__gte=since).values_list("created_at", flat=True)
+
+
+product_views = SlidingWindowQuota("product-views", _product_views_since)
+product_creation = SlidingWindowQuota("product-creation", _products_created_since)
@@ -0,0 +1,29 @@
+from django.core.signals import request_finished, request_started
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import pricing
+from .models import PlanType, SubscriptionDuration, SubscriptionPlan
+from .tracking import view_buffer
+
+
+@receiver(post_save, sender=PlanType)
+@receiver(post_delete, sender=PlanType)
+@receiver(post_save, sender=SubscriptionDuration)
+@receiver(post_delete, sender=SubscriptionDuration)
+@receiver(post_save, sender=SubscriptionPlan)
+@receiver(post_delete, sender=SubscriptionPlan)
+def plans_changed(sender, **kwargs):
+    """Any plan, duration or price edit invalidates the cached price matrix."""
+    pricing.bump_version()
+
+
+@receiver(request_started)
+def start_request(sender, **kwargs):
+    """Each user's product view version is read once per request, however often it is checked."""
+    view_buffer.hold(True)
+
+
+@receiver(request_finished)
+def finish_request(sender, **kwargs):
+    view_buffer.hold(False)
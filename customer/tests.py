@@ -1,3 +1,133 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from catalog.models import Category, Product
+from utils.cache import shared_cache
+
+from . import quota, tracking
+from .backends import AccountBackend
+from .models import PlanType, ProductView, Subscription, SubscriptionDuration, UserProfile
+from .quota import SlidingWindowQuota
+from .tracking import ProductViewBuffer
+
+
+class CustomerDataMixin:
+    """A customer and a seller with two products."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_user("customer", "customer@example.com", "password")
+        seller = User.objects.create_user("seller", "seller@example.com", "password")
+        category = Category.objects.create(name="Laptops")
+        cls.laptop, cls.tablet = (
+            Product.objects.create(name=name, brand="Acme", category=category, created_by=seller)
+            for name in ("Laptop", "Tablet")
+        )
+
+
+class AccountBackendTests(CustomerDataMixin, TestCase):
+    def test_session_user_comes_with_the_whole_account(self):
+        plan = PlanType.objects.create(name="Premium A", max_product_views_per_day=50)
+        duration = SubscriptionDuration.objects.create(duration_days=30)
+        UserProfile.objects.create(user=self.user, phone_number="555-0100")
+        Subscription.objects.create(user=self.user, plan=plan, duration_days=duration, pending_plan=plan)
+
+        with self.assertNumQueries(1):
+            user = AccountBackend().get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(user.profile.phone_number, "555-0100")
+            self.assertEqual(user.subscription.plan.max_product_views_per_day, 50)
+            self.assertEqual(user.subscription.duration_days.duration_days, 30)
+            self.assertEqual(user.subscription.pending_plan, plan)
+            self.assertIsNone(user.subscription.pending_duration)
+
+    def test_inactive_or_missing_users_are_not_returned(self):
+        self.assertIsNone(AccountBackend().get_user(0))
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNone(AccountBackend().get_user(self.user.pk))
+
+
+class ProductViewBufferTests(CustomerDataMixin, TestCase):
+    def setUp(self):
+        timer = mock.patch.object(tracking.threading, "Timer")
+        self.Timer = timer.start()
+        self.addCleanup(timer.stop)
+        self.buffer = ProductViewBuffer(flush_interval=10, max_pending=100)
+
+    def stored_at(self, product):
+        return ProductView.objects.get(user=self.user, product=product).viewed_at
+
+    def test_first_view_is_written_at_once_and_repeats_are_buffered(self):
+        first = tracking.now() - timedelta(minutes=5)
+        self.buffer.record(self.user.pk, self.laptop.pk, first)
+        self.assertEqual(self.stored_at(self.laptop), first)
+
+        self.buffer.record(self.user.pk, self.laptop.pk)
+        self.assertEqual(self.stored_at(self.laptop), first)
+        self.assertTrue(self.buffer.has_viewed(self.user.pk, self.laptop.pk))
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertGreater(self.stored_at(self.laptop), first)
+
+    def test_buffer_is_flushed_once_the_oldest_view_is_due(self):
+        for product in (self.laptop, self.tablet):
+            self.buffer.record(self.user.pk, product.pk, tracking.now() - timedelta(minutes=5))
+        self.buffer.record(self.user.pk, self.laptop.pk)
+        self.Timer.assert_called_once_with(10, self.buffer._flush_in_background)
+        self.Timer.return_value.start.assert_called_once_with()
+
+        self.buffer._oldest -= 11
+        self.buffer.record(self.user.pk, self.tablet.pk)
+
+        fresh = ProductView.objects.filter(user=self.user, viewed_at__gt=tracking.now() - timedelta(minutes=1))
+        self.assertEqual(fresh.count(), 2)
+        self.Timer.return_value.cancel.assert_called_once_with()
+
+    def test_version_is_read_once_per_request(self):
+        self.buffer.record(self.user.pk, self.laptop.pk, tracking.now() - timedelta(minutes=5))
+        cache = shared_cache()
+        self.buffer.hold(True)
+        self.addCleanup(self.buffer.hold, False)
+        with mock.patch.object(cache, "get", wraps=cache.get) as get:
+            self.assertFalse(self.buffer.has_viewed(self.user.pk, self.tablet.pk))
+            self.buffer.record(self.user.pk, self.tablet.pk)  # written at once
+            self.buffer.record(self.user.pk, self.laptop.pk)  # buffered
+            self.assertCountEqual(self.buffer.recent(self.user.pk), [self.laptop.pk, self.tablet.pk])
+        get.assert_called_once_with(ProductViewBuffer._version_key(self.user.pk), 0)
+
+
+class SlidingWindowQuotaTests(CustomerDataMixin, TestCase):
+    def quota(self, source=lambda user_id, since: [], **kwargs):
+        return SlidingWindowQuota(self.id(), source, **kwargs)  # keys of their own in the shared cache
+
+    def test_consume_stops_at_the_limit_and_release_gives_back(self):
+        limited = self.quota()
+        self.assertTrue(limited.consume(self.user.pk, 2))
+        self.assertTrue(limited.consume(self.user.pk, 2))
+        self.assertFalse(limited.consume(self.user.pk, 2))
+        self.assertEqual(limited.used(self.user.pk), 2)
+
+        limited.release(self.user.pk)
+        self.assertEqual(limited.used(self.user.pk), 1)
+        self.assertTrue(limited.consume(self.user.pk, 2))
+
+    def test_events_leave_the_window_as_it_slides(self):
+        limited = self.quota(window=60, buckets=6)
+        with mock.patch.object(quota, "time") as clock:
+            clock.time.return_value = 1000
+            self.assertTrue(limited.consume(self.user.pk, 1))
+            clock.time.return_value = 1055
+            self.assertFalse(limited.consume(self.user.pk, 1))
+            clock.time.return_value = 1060
+            self.assertTrue(limited.consume(self.user.pk, 1))
+
+    def test_seed_counts_first_views_only(self):
+        earlier = tracking.now() - timedelta(days=2)
+        ProductView.objects.create(user=self.user, product=self.laptop, first_viewed_at=earlier)
+        ProductView.objects.create(user=self.user, product=self.tablet)
+
+        self.assertEqual(self.quota(quota._product_views_since).used(self.user.pk), 1)
@@ -0,0 +1,198 @@
+import atexit
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils.timezone import now
+
+from utils.cache import shared_cache
+
+logger = logging.getLogger(__name__)
+
+
+class ProductViewBuffer:
+    """
+    Write-behind buffer for ``ProductView`` rows.
+
+    Detail page hits are recorded in memory and written out as a single bulk
+    upsert once the oldest of them has waited ``flush_interval`` seconds (or
+    once ``max_pending`` views are waiting), instead of a SELECT plus
+    UPDATE/INSERT per hit on the hottest rows of the table. A timer thread
+    flushes the buffer when no further view arrives to do it.
+
+    Only repeat views inside the ``recent_hours`` window are buffered. A view that
+    changes what ``has_viewed`` or ``recent`` answer (the first view of a
+    product, or one after the window lapsed) is written at once and bumps a
+    per-user version in the shared cache. Quota checks are answered from a
+    per-user snapshot of their views, loaded with one query and reloaded when
+    that version moves or after ``state_timeout`` seconds, so every worker
+    sees another worker's first views on its next check. While a request is
+    running (see ``hold``) each user's version is read from the shared cache
+    once, however often the request asks.
+    """
+
+    recent_hours = 24
+
+    def __init__(self, flush_interval=None, max_pending=None, state_timeout=None):
+        self._lock = threading.Lock()
+        self._pending = {}  # (user id, product id) -> viewed_at
+        self._states = {}  # user id -> (loaded at, version, {product id: viewed_at})
+        self._oldest = None  # when the oldest pending view was buffered
+        self._timer = None
+        self._request = threading.local()
+        self.flush_interval = flush_interval or getattr(settings, "PRODUCT_VIEW_FLUSH_INTERVAL", 10)
+        self.max_pending = max_pending or getattr(settings, "PRODUCT_VIEW_BUFFER_SIZE", 500)
+        self.state_timeout = state_timeout or getattr(settings, "PRODUCT_VIEW_STATE_TIMEOUT", 60)
+
+    @staticmethod
+    def _version_key(user_id):
+        return f"views:{user_id}:version"
+
+    def hold(self, active):
+        """
+        Called on request_started/request_finished: while a request is running,
+        the version of each user it touches is asked of the shared cache once.
+        """
+        self._request.versions = {} if active else None
+
+    def _version(self, user_id):
+        versions = getattr(self._request, "versions", None)
+        if versions is not None and user_id in versions:
+            return versions[user_id]
+        version = shared_cache().get(self._version_key(user_id), 0)
+        if versions is not None:
+            versions[user_id] = version
+        return version
+
+    def _load(self, user_id, version):
+        from .models import ProductView
+
+        views = dict(ProductView.objects.filter(user_id=user_id).values_list("product_id", "viewed_at"))
+        with self._lock:
+            for (pending_user, product_id), viewed_at in self._pending.items():
+                if pending_user == user_id:
+                    views[product_id] = viewed_at
+            self._states[user_id] = (time.monotonic(), version, views)
+        return views
+
+    def views(self, user_id):
+        """``{product id: last viewed_at}`` for every product the user has opened."""
+        version = self._version(user_id)
+        with self._lock:
+            state = self._states.get(user_id)
+        if state is None or state[1] != version or time.monotonic() - state[0] > self.state_timeout:
+            return self._load(user_id, version)
+        return state[2]
+
+    def has_viewed(self, user_id, product_id):
+        return product_id in self.views(user_id)
+
+    def recent(self, user_id, hours=None):
+        """Ids of the products the user opened within the last ``hours``."""
+        threshold = now() - timedelta(hours=hours or self.recent_hours)
+        return [product_id for product_id, viewed_at in self.views(user_id).items() if viewed_at >= threshold]
+
+    def _write(self, user_id, product_id, viewed_at):
+        """
+        Upserts one view right away and bumps the user's version so the other
+        workers reload their snapshot. Returns the new version.
+        """
+        from .models import ProductView
+
+        ProductView.objects.update_or_create(
+            user_id=user_id, product_id=product_id, defaults={"viewed_at": viewed_at},
+            create_defaults={"viewed_at": viewed_at, "first_viewed_at": viewed_at},
+        )
+        cache = shared_cache()
+        try:
+            version = cache.incr(self._version_key(user_id))
+        except ValueError:
+            version = 1
+            cache.set(self._version_key(user_id), version, None)
+        versions = getattr(self._request, "versions", None)
+        if versions is not None:
+            versions[user_id] = version
+        return version
+
+    def record(self, user_id, product_id, viewed_at=None):
+        viewed_at = viewed_at or now()
+        views = self.views(user_id)
+        previous = views.get(product_id)
+        if previous is None or previous < viewed_at - timedelta(hours=self.recent_hours):
+            version = self._write(user_id, product_id, viewed_at)
+            with self._lock:
+                views[product_id] = viewed_at
+                self._pending.pop((user_id, product_id), None)
+                state = self._states.get(user_id)
+                if state is not None and state[1] == version - 1:  # nobody else wrote in between
+                    self._states[user_id] = (state[0], version, views)
+            return
+        timer = None
+        with self._lock:
+            views[product_id] = viewed_at
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending[(user_id, product_id)] = viewed_at
+            due = (
+                len(self._pending) >= self.max_pending
+                or time.monotonic() - self._oldest >= self.flush_interval
+            )
+            if not due and self._timer is None:
+                timer = self._timer = threading.Timer(self.flush_interval, self._flush_in_background)
+                timer.daemon = True
+        if due:
+            self.flush()
+        elif timer is not None:
+            timer.start()
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        finally:
+            connection.close()
+
+    def flush(self):
+        """Write every buffered view in one upsert; returns the number of rows sent."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._oldest = None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            expired = [
+                user_id for user_id, (loaded_at, _, _) in self._states.items()
+                if time.monotonic() - loaded_at > self.state_timeout
+            ]
+            for user_id in expired:
+                del self._states[user_id]
+        if not pending:
+            return 0
+
+        from catalog.models import Product
+        from .models import ProductView
+
+        options = {"update_conflicts": True, "update_fields": ["viewed_at"]}
+        if connection.features.supports_update_conflicts_with_target:
+            options["unique_fields"] = ["user", "product"]
+        try:
+            # Products deleted since they were viewed would fail the whole batch.
+            existing = set(
+                Product.objects.filter(pk__in={product_id for _, product_id in pending}).values_list("pk", flat=True)
+            )
+            rows = [
+                ProductView(user_id=user_id, product_id=product_id, viewed_at=viewed_at, first_viewed_at=viewed_at)
+                for (user_id, product_id), viewed_at in pending.items()
+                if product_id in existing
+            ]
+            ProductView.objects.bulk_create(rows, batch_size=500, **options)
+        except Exception:
+            logger.exception("Dropped %s buffered product views", len(pending))
+            return 0
+        return len(rows)
+
+
+view_buffer = ProductViewBuffer()
+atexit.register(view_buffer.flush)
@@ -12,9 +12,11 @@ from django.urls import reverse, reverse_lazy
 from django.utils.http import urlsafe_base64_decode
 from django.contrib.auth.hashers import make_password
 from .models import UserProfile, BusinessProfile
-from catalog.models import Category
+from catalog.models import Category, PendingUpload, StorageDeletion
+from catalog.direct_uploads import claim
 from .forms import RegistrationForm
 from django.http import JsonResponse
+from django.db import transaction
 import logging
 logger = logging.getLogger(__name__)
 
@@ -166,26 +168,32 @@ def upload_profile_picture(request):
     if request.method != "POST":
         return JsonResponse({"success": False, "error": "Invalid request method"}, status=400)
 
-    if not request.FILES.get("profile_picture"):
-        return JsonResponse({"success": False, "error": "No file uploaded"}, status=400)
-
-    profile_picture = request.FILES["profile_picture"]
     user = request.user
+    upload = None
+    if request.POST.get("upload"):
+        # Uploaded straight to S3 with a presigned POST; only check and record it
+        uploads, failed = claim(user, PendingUpload.PROFILE_PICTURE, [request.POST["upload"]])
+        if failed:
+            return JsonResponse({"success": False, "error": "The uploaded picture could not be found"}, status=400)
+        upload = uploads[0]
+    elif not request.FILES.get("profile_picture"):
+        return JsonResponse({"success": False, "error": "No file uploaded"}, status=400)
 
     try:
         # Get or create user profile
         profile, created = UserProfile.objects.get_or_create(user=user)
         
-        # Delete old profile picture if exists
-        if profile.profile_picture:
-            try:
-                profile.profile_picture.delete(save=False)
-            except Exception as e:
-                logger.error(f"Failed to delete old profile picture: {str(e)}")
-
-        # Save new profile picture
-        profile.profile_picture = profile_picture
-        profile.save()
+        old_picture = profile.profile_picture.name
+
+        # Save new profile picture; the old one is queued for deletion from S3
+        with transaction.atomic():
+            if upload:
+                profile.profile_picture.name = upload.key
+                upload.delete()
+            else:
+                profile.profile_picture = request.FILES["profile_picture"]
+            profile.save()
+            StorageDeletion.enqueue(old_picture)
 
         return JsonResponse({
             "success": True, 
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.5 on 2026-10-18 16:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("home", "0002_promotionbanner_updated"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="promotionbanner",
+            name="renditions",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -1,5 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from storages.backends.s3boto3 import S3Boto3Storage
+from catalog.models import StorageDeletion
+from utils.renditions import rendition_names
 
 class PromotionBanner(models.Model):
     title = models.CharField(max_length=255, blank=True, null=True)
@@ -7,15 +9,18 @@ class PromotionBanner(models.Model):
     image = models.ImageField(upload_to='promotion_banners/',storage=S3Boto3Storage(), blank=True,null=True)
     link = models.URLField(max_length=500, blank=True, null=True)
     is_active = models.BooleanField(default=True)
+    updated = models.DateTimeField(auto_now=True)
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return self.title if self.title else "Promotion Banner"
 
     def delete(self, *args, **kwargs):
-        """Delete image from S3 when model is deleted"""
-        if self.image:
-            self.image.delete()
-        super().delete(*args, **kwargs)
+        """Queue the image and its renditions for deletion from S3 when the model is deleted"""
+        with transaction.atomic():
+            if self.image:
+                StorageDeletion.enqueue(self.image.name, *rendition_names(self))
+            super().delete(*args, **kwargs)
 
     class Meta:
         db_table = 'promotion_banner'
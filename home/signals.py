@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from utils import renditions
+from utils.cache import invalidate
+
+from .models import PromotionBanner
+from .views import BANNERS_KEY
+
+
+@receiver(post_save, sender=PromotionBanner)
+@receiver(post_delete, sender=PromotionBanner)
+def banners_changed(sender, instance, **kwargs):
+    invalidate(BANNERS_KEY)
+    if kwargs.get("signal") is post_save and renditions.needs_renditions(instance):
+        renditions.schedule(sender, [instance.image.name])
+
+
+@receiver(renditions.renditions_ready, sender=PromotionBanner)
+def banner_renditions_ready(sender, **kwargs):
+    invalidate(BANNERS_KEY)
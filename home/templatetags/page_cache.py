@@ -0,0 +1,20 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from utils.page_cache import hole, holes, is_shared_render
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def personal(context, template_name, **params):
+    """
+    Includes a per-user fragment (menus, messages). When the page is being
+    rendered for the shared page cache it leaves a placeholder instead, filled
+    in per request by ``utils.page_cache.fill_holes``. ``params`` are the
+    page-level values the fragment uses, e.g. ``query=query``.
+    """
+    if template_name in holes() and is_shared_render(context.get("request")):
+        return mark_safe(hole(template_name, params))
+    with context.push(**params):
+        return context.template.engine.get_template(template_name).render(context)
@@ -1,3 +1,30 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from .models import PromotionBanner
+
+
+class HomePageTests(TestCase):
+    def setUp(self):
+        self.banner = PromotionBanner.objects.create(title="Sale")
+
+    def get(self, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(reverse("home:home"), **headers)
+
+    def test_unchanged_page_answers_304(self):
+        etag = self.get()["ETag"]
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_banner_edits_and_logins_change_the_etag(self):
+        etag = self.get()["ETag"]
+        self.banner.title = "Bigger sale"
+        self.banner.save()
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+
+        self.client.force_login(User.objects.create_user("customer"))
+        self.assertEqual(self.get(response["ETag"]).status_code, 200)
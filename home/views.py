@@ -1,8 +1,36 @@
+from django.conf import settings
+from django.db.models import Count, Max
 from django.shortcuts import render
-from catalog.models import Category
+from catalog.categories import current_version, home_categories
+from utils.cache import get_or_compute
+from utils.http import make_etag, not_modified, set_validators
 from .models import PromotionBanner
 
+BANNERS_KEY = "home:banners"
+
+
+def banner_state():
+    """The banners shown on the home page plus the validators for all active banners."""
+    active = PromotionBanner.objects.filter(is_active=True)
+    state = active.aggregate(latest=Max("updated"), count=Count("pk"))
+    state["banners"] = list(active[:4])  # Fetch only 4 active banners
+    return state
+
+
 def home_page(request):
-    categories = Category.objects.filter(is_active=True, include_in_home=True).order_by("id")
-    promotion_banners = PromotionBanner.objects.filter(is_active=True)[:4]  # Fetch only 4 active banners
-    return render(request, 'default/home/home.html', {'categories': categories, 'promotion_banners': promotion_banners})
+    categories = home_categories()
+    banners = get_or_compute(
+        BANNERS_KEY, banner_state, getattr(settings, "HOME_BANNERS_CACHE_TIMEOUT", 300), stale=60, name="home"
+    )
+
+    last_modified = max(
+        [category.updated for category in categories] + ([banners["latest"]] if banners["latest"] else []),
+        default=None,
+    )
+    etag = make_etag(request.user.pk, current_version(), banners["latest"], banners["count"])
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+
+    response = render(request, 'default/home/home.html', {'categories': categories, 'promotion_banners': banners["banners"]})
+    return set_validators(response, etag, last_modified)
@@ -0,0 +1,26 @@
+// Uploads a file straight to S3: `url` (catalog:direct_upload) returns a
+// presigned POST for it, so the bytes never pass through our workers.
+// Resolves with the upload id the form then posts instead of the file.
+function directUpload(url, csrfToken, file, purpose) {
+    const request = new FormData();
+    request.append("purpose", purpose);
+    request.append("name", file.name);
+    request.append("content_type", file.type);
+    request.append("size", file.size);
+    return fetch(url, {
+        method: "POST",
+        body: request,
+        headers: { "X-CSRFToken": csrfToken }
+    })
+    .then((response) => response.json())
+    .then((data) => {
+        if (!data.success) throw new Error(data.error);
+        const upload = new FormData();
+        Object.entries(data.fields).forEach(([name, value]) => upload.append(name, value));
+        upload.append("file", file);
+        return fetch(data.url, { method: "POST", body: upload }).then((response) => {
+            if (!response.ok) throw new Error("S3 rejected " + file.name);
+            return data.id;
+        });
+    });
+}
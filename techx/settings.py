@@ -65,6 +65,13 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Sessions created before AccountBackend keep resolving through ModelBackend
+# until the user logs in again.
+AUTHENTICATION_BACKENDS = [
+    "customer.backends.AccountBackend",
+    "django.contrib.auth.backends.ModelBackend",
+]
+
 ROOT_URLCONF = "techx.urls"
 
 TEMPLATES = [
@@ -170,11 +177,96 @@ AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
 AWS_STORAGE_BUCKET_NAME = os.getenv('AWS_STORAGE_BUCKET_NAME')
 AWS_S3_REGION_NAME = os.getenv('AWS_S3_REGION_NAME')
+AWS_S3_ENDPOINT_URL = os.getenv('AWS_S3_ENDPOINT_URL')  # e.g. a local MinIO in development
 AWS_S3_FILE_OVERWRITE = False
 AWS_DEFAULT_ACL = None
 AWS_QUERYSTRING_AUTH = False
+PRODUCT_IMAGE_UPLOAD_WORKERS = 4  # concurrent S3 uploads per product
+
+# Browser-to-S3 uploads with presigned POSTs (the bucket needs a CORS rule allowing POST from the site)
+DIRECT_UPLOAD_EXPIRES = 600  # seconds the presigned POST stays valid
+DIRECT_UPLOAD_TTL = 60 * 60  # unattached uploads older than this are purged
+DIRECT_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+DIRECT_UPLOAD_MAX_PENDING = 20  # per user
+
+# S3 objects are deleted from an outbox by `manage.py drain_storage_deletions`
+STORAGE_DELETION_MAX_ATTEMPTS = 10
+
+# Thumbnails and WebP variants (utils.renditions), generated after upload
+IMAGE_RENDITION_WORKERS = 2
+IMAGE_RENDITION_SIZES = {
+    "thumb": (160, 160),
+    "card": (480, 480),
+    "large": (1200, 1200),
+}
 
 DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
 
 
+# Caches: "cards" holds rendered product cards and is LRU-culled at MAX_ENTRIES
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "cards": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "product-cards",
+        "TIMEOUT": 24 * 60 * 60,
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+}
+if os.getenv("REDIS_URL"):
+    CACHES["shared"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("REDIS_URL"),
+    }
+else:  # development: a single process, so a local cache is shared enough
+    CACHES["shared"] = {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "shared",
+    }
+# State every worker must agree on (search generation, view versions, quotas);
+# needs atomic incr, so Redis in production (`manage.py check --deploy` warns)
+SHARED_CACHE = "shared"
+PRODUCT_CARD_CACHE = "cards"
+PRODUCT_CARD_CACHE_TIMEOUT = 24 * 60 * 60  # upper bound; young products expire sooner for timesince
+
+HOME_BANNERS_CACHE_TIMEOUT = 5 * 60  # seconds; also dropped when a banner is saved or deleted
+CATEGORIES_CACHE_TIMEOUT = 10 * 60  # seconds; the list is also reloaded on any category change
+PRICING_CACHE_TIMEOUT = 10 * 60  # seconds; the price matrix is also reloaded on any plan or price change
+
+# Shared page bodies (utils.page_cache); these fragments are rendered per user
+PAGE_CACHE_TIMEOUT = 60
+PAGE_CACHE_HOLES = (
+    "default/layout/top_menu.html",
+    "default/layout/mobile_nav.html",
+    "default/layout/messages.html",
+)
+
+# Product search index
+SEARCH_INDEX_SYNC_INTERVAL = 30  # seconds between updated_at delta syncs
+SEARCH_INDEX_REBUILD_INTERVAL = 60 * 60  # seconds before a full rebuild
+SEARCH_FUZZY_MIN_RESULTS = 5  # fall back to typo-tolerant matching below this
+SEARCH_FUZZY_THRESHOLD = 0.3  # minimum trigram similarity
+SEARCH_SUGGESTIONS_LIMIT = 8  # autocomplete entries per keystroke
+SEARCH_RESULT_CACHE_SIZE = 512  # result pages kept per worker (LRU)
+SEARCH_RESULT_CACHE_TIMEOUT = 5 * 60  # seconds; pages are also dropped when their category changes
+FACETS_CACHE_TIMEOUT = 5 * 60  # seconds; facet counts are also dropped on any catalog change
+SEARCH_FIELD_WEIGHTS = {
+    "name": 3.0,
+    "brand": 2.5,
+    "category": 1.5,
+    "document": 1.0,  # plain-text specification + description
+}
+
+# Product detail view tracking (customer.tracking)
+PRODUCT_VIEW_FLUSH_INTERVAL = 10  # seconds between bulk upserts of buffered views
+PRODUCT_VIEW_BUFFER_SIZE = 500  # flush early once this many views are waiting
+PRODUCT_VIEW_STATE_TIMEOUT = 60  # seconds a user's view snapshot is trusted
+
+# Daily plan limits (customer.quota): sliding window split into buckets in the shared cache
+QUOTA_WINDOW = 24 * 60 * 60  # seconds
+QUOTA_BUCKETS = 24
+
+
 SECRET_ENCRYPTION_KEY = os.getenv('SECRET_ENCRYPTION_KEY').encode()
\ No newline at end of file
@@ -0,0 +1,159 @@
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+# (name, event) -> count; events are hit, stale, miss, refresh, wait and error.
+metrics = Counter()
+_metrics_lock = threading.Lock()
+
+
+def _record(name, event):
+    with _metrics_lock:
+        metrics[(name, event)] += 1
+    logger.debug("cache %s %s", name, event)
+
+
+def metrics_snapshot():
+    """``{name: {event: count}}`` of everything recorded so far in this process."""
+    with _metrics_lock:
+        snapshot = {}
+        for (name, event), count in metrics.items():
+            snapshot.setdefault(name, {})[event] = count
+        return snapshot
+
+
+def shared_cache():
+    """
+    The cache every worker sees (``SHARED_CACHE``), for state that must agree
+    across processes: the search index generation, per-user product view
+    versions and plan quotas.
+    """
+    return caches[getattr(settings, "SHARED_CACHE", "default")]
+
+
+# Backends that are per-process, or whose incr() is a read followed by a write
+# that two workers can interleave.
+UNSHARED_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+    "django.core.cache.backends.filebased.FileBasedCache",
+    "django.core.cache.backends.db.DatabaseCache",
+)
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(**kwargs):
+    alias = getattr(settings, "SHARED_CACHE", "default")
+    backend = settings.CACHES.get(alias, {}).get("BACKEND")
+    if backend in UNSHARED_BACKENDS:
+        return [
+            checks.Warning(
+                f"The shared cache {alias!r} uses {backend}.",
+                hint="Point it at Redis or Memcached (set REDIS_URL); otherwise every worker keeps its "
+                "own copy of state that is meant to be shared.",
+                id="utils.W001",
+            )
+        ]
+    return []
+
+
+def jittered(timeout, jitter):
+    """Spread expiries so entries written together do not all expire together."""
+    if timeout is None or not jitter:
+        return timeout
+    return max(1, timeout * (1 + random.uniform(-jitter, jitter)))
+
+
+def get_or_compute(
+    key,
+    compute,
+    timeout,
+    stale=None,
+    jitter=0.1,
+    lock_timeout=30,
+    wait=5,
+    name=None,
+    cache_alias=None,
+):
+    """
+    Returns the cached value for ``key``, computing it with ``compute()`` at
+    most once at a time across every worker sharing the cache.
+
+    Values are fresh for ``timeout`` seconds (jittered by +/- ``jitter``) and
+    are then served stale for up to ``stale`` more seconds while the one
+    worker that wins the refresh lock recomputes them. On a cold miss the
+    losers of the lock poll for up to ``wait`` seconds, then try for the lock
+    once more and compute either way. ``timeout=None`` caches until the key
+    is deleted, which suits keys that embed a version counter.
+
+    The lock is a ``cache.add`` of a token only its owner knows, and only the
+    owner deletes it, so a worker that computed without the lock never frees
+    one another worker holds. Values live in the shared cache unless
+    ``cache_alias`` names another.
+    """
+    cache = shared_cache() if cache_alias is None else caches[cache_alias]
+    name = name or key.split(":", 1)[0]
+    lock_key = f"{key}:lock"
+
+    entry = cache.get(key)
+    if entry is not None:
+        value, fresh_until = entry
+        if fresh_until is None or fresh_until > time.time():
+            _record(name, "hit")
+            return value
+        token = _lock(cache, lock_key, lock_timeout)
+        if token is None:
+            _record(name, "stale")
+            return value
+        return _refresh(cache, key, lock_key, token, compute, timeout, stale, jitter, name, "refresh", fallback=value)
+
+    token = _lock(cache, lock_key, lock_timeout)
+    if token is None:
+        _record(name, "wait")
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+        token = _lock(cache, lock_key, lock_timeout)
+    return _refresh(cache, key, lock_key, token, compute, timeout, stale, jitter, name, "miss")
+
+
+def _lock(cache, lock_key, lock_timeout):
+    """The lock's token if this call took it, otherwise None."""
+    token = uuid.uuid4().hex
+    return token if cache.add(lock_key, token, lock_timeout) else None
+
+
+def _refresh(cache, key, lock_key, token, compute, timeout, stale, jitter, name, event, fallback=None):
+    _record(name, event)
+    try:
+        value = compute()
+    except Exception:
+        _record(name, "error")
+        if event == "refresh":
+            logger.exception("Refreshing %s failed; serving the stale value", key)
+            return fallback
+        raise
+    else:
+        fresh_for = jittered(timeout, jitter)
+        fresh_until = None if fresh_for is None else time.time() + fresh_for
+        cache.set(key, (value, fresh_until), None if fresh_for is None else fresh_for + (stale or 0))
+        return value
+    finally:
+        if token is not None and cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+def invalidate(key, cache_alias=None):
+    (shared_cache() if cache_alias is None else caches[cache_alias]).delete(key)
@@ -0,0 +1,37 @@
+import hashlib
+
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """Strong ETag from the values a page depends on."""
+    return '"%s"' % hashlib.md5(":".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def not_modified(request, etag, last_modified=None):
+    """
+    A 304 response when the client's copy is still current, otherwise None.
+    Pages with flash messages waiting are always rendered, since the cached
+    copy cannot contain them.
+    """
+    if request.method not in ("GET", "HEAD") or len(get_messages(request)):
+        return None
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified=None):
+    """Attach the validators and make browsers (but not shared caches) revalidate."""
+    response.headers["ETag"] = etag
+    if last_modified:
+        response.headers["Last-Modified"] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
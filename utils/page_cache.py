@@ -0,0 +1,80 @@
+import hashlib
+import re
+from urllib.parse import parse_qsl, urlencode
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from utils.cache import shared_cache
+
+# <!--hole:default/layout/top_menu.html?query=phone-->
+HOLE_RE = re.compile(r"<!--hole:([\w./-]+)\?([^>]*)-->")
+
+
+def holes():
+    """Templates that may be punched out of a shared page (the per-user fragments)."""
+    return getattr(settings, "PAGE_CACHE_HOLES", ())
+
+
+def is_shared_render(request):
+    return getattr(request, "shared_render", False)
+
+
+def hole(template_name, params):
+    """Placeholder for a per-user fragment; ``params`` are page-level values the fragment needs."""
+    return f"<!--hole:{template_name}?{urlencode(params)}-->"
+
+
+def fill_holes(html, request):
+    """Render each placeholder's template for this user and splice it in."""
+    rendered = {}
+
+    def replace(match):
+        template_name = match.group(1)
+        if template_name not in holes():
+            return ""
+        if match.group(0) not in rendered:
+            rendered[match.group(0)] = render_to_string(
+                template_name, dict(parse_qsl(match.group(2), keep_blank_values=True)), request=request
+            )
+        return rendered[match.group(0)]
+
+    return HOLE_RE.sub(replace, html)
+
+
+def page_key(request, *versions):
+    """Cache key for a page: path, query string and the versions of the data it shows."""
+    query = urlencode(sorted(request.GET.items()))
+    digest = hashlib.md5(f"{request.path}?{query}".encode()).hexdigest()
+    return "page:{}:{}".format(digest, ":".join(str(version) for version in versions))
+
+
+def cached_page(request, key, render, timeout=None):
+    """
+    Serve a page whose body is shared by every user. On a miss ``render()``
+    is called with ``request.shared_render`` set, so ``{% personal %}``
+    fragments come out as placeholders; the result is cached in the shared
+    cache, so every worker serves the body one of them rendered, and the
+    placeholders are filled for the current user on every response.
+    """
+    cache = shared_cache()
+    html = cache.get(key)
+    if html is None:
+        request.shared_render = True
+        try:
+            response = render()
+            if hasattr(response, "render"):
+                response.render()
+        finally:
+            request.shared_render = False
+        if response.status_code != 200:
+            return response
+        html = response.content.decode(response.charset)
+        cache.set(key, html, timeout if timeout is not None else getattr(settings, "PAGE_CACHE_TIMEOUT", 60))
+
+    response = HttpResponse(fill_holes(html, request))
+    patch_vary_headers(response, ("Cookie",))
+    patch_cache_control(response, private=True)
+    return response
@@ -0,0 +1,161 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, models, transaction
+from django.dispatch import Signal
+from django.utils.timezone import now
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Sent with ``names=[...]`` (the source image names) once renditions are stored.
+renditions_ready = Signal()
+
+DEFAULT_SIZES = {
+    "thumb": (160, 160),
+    "card": (480, 480),
+    "large": (1200, 1200),
+}
+
+# Format name -> (Pillow format, file extension, save options)
+FORMATS = {
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "jpg", {"quality": 85, "optimize": True, "progressive": True}),
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def sizes():
+    return getattr(settings, "IMAGE_RENDITION_SIZES", DEFAULT_SIZES)
+
+
+def pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, "IMAGE_RENDITION_WORKERS", 2), thread_name_prefix="renditions"
+            )
+        return _pool
+
+
+def rendition_name(source, size, fmt):
+    """``products/x/photo.jpg`` -> ``products/x/renditions/photo_card.webp``"""
+    directory, filename = os.path.split(source)
+    root = os.path.splitext(filename)[0]
+    return os.path.join(directory, "renditions", f"{root}_{size}.{FORMATS[fmt][1]}")
+
+
+def render(image, box, fmt):
+    """Encode ``image`` shrunk to fit ``box`` (never enlarged) in ``fmt``."""
+    pil_format, _, options = FORMATS[fmt]
+    copy = image.copy()
+    copy.thumbnail(box, Image.LANCZOS)
+    if pil_format == "JPEG" and copy.mode not in ("RGB", "L"):
+        background = Image.new("RGB", copy.size, (255, 255, 255))
+        background.paste(copy, mask=copy.convert("RGBA").split()[-1])
+        copy = background
+    buffer = io.BytesIO()
+    copy.save(buffer, pil_format, **options)
+    return copy.size, buffer.getvalue()
+
+
+def generate(field_file):
+    """
+    Writes every size/format of ``field_file`` next to the original and
+    returns the mapping stored in the model's ``renditions`` field.
+    """
+    storage = field_file.storage
+    with storage.open(field_file.name, "rb") as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+
+    data = {"source": field_file.name, "width": image.width, "height": image.height, "sizes": {}}
+    for size, box in sizes().items():
+        entry = {}
+        for fmt in FORMATS:
+            dimensions, content = render(image, box, fmt)
+            name = rendition_name(field_file.name, size, fmt)
+            if storage.exists(name):
+                storage.delete(name)
+            entry[fmt] = storage.save(name, ContentFile(content))
+            entry["width"], entry["height"] = dimensions
+        data["sizes"][size] = entry
+    return data
+
+
+def process(model, names, field_name="image"):
+    """
+    Generates renditions once for each of ``names`` and stores them on every
+    ``model`` row whose ``field_name`` holds that name (rows may share an
+    image), with an UPDATE that also touches any auto_now column, so caches
+    keyed on it move on. Rows are matched on the file name rather than the
+    primary key, which bulk_create does not return on MySQL, and a row whose
+    image was replaced meanwhile is left alone.
+    """
+    touched = {
+        field.name: now()
+        for field in model._meta.concrete_fields
+        if isinstance(field, models.DateTimeField) and field.auto_now
+    }
+    done = []
+    for name in dict.fromkeys(names):
+        instance = model._default_manager.filter(**{field_name: name}).first()
+        if instance is None:
+            continue
+        field_file = getattr(instance, field_name)
+        try:
+            data = generate(field_file)
+        except Exception:
+            logger.exception("Could not generate renditions for %s", name)
+            continue
+        model._default_manager.filter(**{field_name: name}).update(renditions=data, **touched)
+        done.append(name)
+    if done:
+        renditions_ready.send(sender=model, names=done)
+    return done
+
+
+def _run(model, names, field_name):
+    try:
+        process(model, names, field_name)
+    finally:
+        close_old_connections()
+
+
+def schedule(model, names, field_name="image"):
+    """Queue rendition generation for after the current transaction commits."""
+    names = [name for name in names if name]
+    if names:
+        transaction.on_commit(lambda: pool().submit(_run, model, names, field_name))
+
+
+def needs_renditions(instance, field_name="image"):
+    field_file = getattr(instance, field_name)
+    return bool(field_file) and (instance.renditions or {}).get("source") != field_file.name
+
+
+def rendition_names(instance):
+    """Storage names of every rendition stored for ``instance``."""
+    return [
+        entry[fmt]
+        for entry in (instance.renditions or {}).get("sizes", {}).values()
+        for fmt in FORMATS
+        if entry.get(fmt)
+    ]
+
+
+def rendition_url(instance, size, fmt="webp"):
+    """URL of one rendition, falling back to the original until it has been generated."""
+    entry = (instance.renditions or {}).get("sizes", {}).get(size)
+    field_file = instance.image
+    if entry and entry.get(fmt) and (instance.renditions or {}).get("source") == field_file.name:
+        return field_file.storage.url(entry[fmt])
+    return field_file.url if field_file else ""
@@ -0,0 +1,133 @@
+import io
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from catalog.models import ProductImage
+
+from . import renditions
+from .cache import get_or_compute, shared_cache
+
+
+class GetOrComputeTests(SimpleTestCase):
+    key = "tests:get-or-compute"
+    lock_key = f"{key}:lock"
+
+    def setUp(self):
+        self.cache = shared_cache()
+        self.cache.delete_many([self.key, self.lock_key])
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return "value"
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(get_or_compute(self.key, compute, 60)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["value"] * 5)
+
+    def test_stale_value_is_served_while_another_worker_refreshes(self):
+        self.cache.set(self.key, ("old", time.time() - 1), None)
+        self.cache.add(self.lock_key, "other")  # another worker is refreshing
+        self.assertEqual(get_or_compute(self.key, lambda: "new", 60, stale=60), "old")
+
+        self.cache.delete(self.lock_key)
+        self.assertEqual(get_or_compute(self.key, lambda: "new", 60, stale=60), "new")
+        self.assertEqual(get_or_compute(self.key, lambda: "newer", 60, stale=60), "new")
+
+    def test_waiter_that_gives_up_leaves_the_owners_lock(self):
+        self.cache.add(self.lock_key, "other", 60)
+        self.assertEqual(get_or_compute(self.key, lambda: "value", 60, wait=0.1), "value")
+        self.assertEqual(self.cache.get(self.lock_key), "other")
+
+    def test_waiter_takes_over_an_expired_lock(self):
+        self.cache.add(self.lock_key, "other", 0.05)
+        self.assertEqual(get_or_compute(self.key, lambda: "value", 60, wait=0.2), "value")
+        self.assertIsNone(self.cache.get(self.lock_key))
+
+    def test_failed_refresh_serves_the_stale_value(self):
+        self.cache.set(self.key, ("old", time.time() - 1), None)
+
+        def compute():
+            raise RuntimeError("backend down")
+
+        with self.assertLogs("utils.cache", "ERROR"):
+            self.assertEqual(get_or_compute(self.key, compute, 60, stale=60), "old")
+        self.assertIsNone(self.cache.get(self.lock_key))
+        self.assertEqual(get_or_compute(self.key, lambda: "new", 60), "new")
+
+    def test_failed_miss_raises_and_releases_the_lock(self):
+        def compute():
+            raise RuntimeError("backend down")
+
+        with self.assertRaises(RuntimeError):
+            get_or_compute(self.key, compute, 60)
+        self.assertIsNone(self.cache.get(self.lock_key))
+        self.assertIsNone(self.cache.get(self.key))
+
+
+@override_settings(IMAGE_RENDITION_SIZES={"thumb": (160, 160), "card": (480, 480)})
+class RenditionTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.storage = FileSystemStorage(location=directory.name)
+
+    @staticmethod
+    def encoded(size, mode="RGB", fmt="PNG"):
+        buffer = io.BytesIO()
+        Image.new(mode, size, (200, 30, 30, 128) if mode == "RGBA" else (200, 30, 30)).save(buffer, fmt)
+        return buffer.getvalue()
+
+    def test_render_shrinks_to_fit_and_never_enlarges(self):
+        image = Image.new("RGB", (800, 400))
+        self.assertEqual(renditions.render(image, (160, 160), "webp")[0], (160, 80))
+        self.assertEqual(renditions.render(image, (1200, 1200), "webp")[0], (800, 400))
+
+    def test_jpeg_flattens_transparency(self):
+        image = Image.open(io.BytesIO(self.encoded((40, 40), "RGBA")))
+        _, content = renditions.render(image, (160, 160), "jpeg")
+        self.assertEqual(Image.open(io.BytesIO(content)).mode, "RGB")
+
+    def test_generate_stores_every_size_and_format_next_to_the_source(self):
+        name = self.storage.save("products/photo.png", ContentFile(self.encoded((1000, 500))))
+        data = renditions.generate(SimpleNamespace(name=name, storage=self.storage))
+
+        self.assertEqual((data["source"], data["width"], data["height"]), (name, 1000, 500))
+        self.assertEqual(set(data["sizes"]), {"thumb", "card"})
+        card = data["sizes"]["card"]
+        self.assertEqual((card["width"], card["height"]), (480, 240))
+        self.assertEqual(card["webp"], "products/renditions/photo_card.webp")
+        with self.storage.open(card["jpeg"]) as stored:
+            self.assertEqual(Image.open(stored).format, "JPEG")
+
+    def test_url_falls_back_to_the_original_until_generated(self):
+        image = ProductImage(image="products/photo.png")
+        self.assertTrue(renditions.rendition_url(image, "card").endswith("/products/photo.png"))
+
+        image.renditions = {
+            "source": "products/photo.png",
+            "sizes": {"card": {"webp": "products/renditions/photo_card.webp"}},
+        }
+        self.assertTrue(renditions.rendition_url(image, "card").endswith("/products/renditions/photo_card.webp"))
+        self.assertTrue(renditions.rendition_url(image, "card", "jpeg").endswith("/products/photo.png"))
+
+        image.image = "products/other.png"  # replaced; the stored renditions belong to the old image
+        self.assertTrue(renditions.rendition_url(image, "card").endswith("/products/other.png"))